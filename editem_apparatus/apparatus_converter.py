@@ -1,27 +1,31 @@
-import csv
-import glob
+import contextlib
+import copy
 import itertools
 import os
 import re
 import sys
+import time
 import traceback
-import xml.etree.ElementTree as ET
-import xml.sax
-from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from dataclasses import dataclass
-from typing import Any, Dict, Union
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, Optional, Union
 
-import xmltodict
-from loguru import logger
-from toolz import pipe
-
-from editem_apparatus.apparatus_handler import ApparatusHandler
+from editem_apparatus.cli import apparatus_main
+from editem_apparatus.collation import NAME_LINK_POLICIES, fold, person_collation_key
+from editem_apparatus.conversion_log import ConversionLog
 from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
-from editem_apparatus.io_tools import IOHandler
+from editem_apparatus.io_tools import ArchiveIOHandler, BufferedIOHandler, IOHandler, MemoryIOHandler
+from editem_apparatus.search_index import build_search_index, find_duplicate_labels, is_lang_map
+from editem_apparatus.tabular_export import TABLES, bibl_row, object_row, relation_rows, text_value
+from editem_apparatus.validation import APPARATUS_CAPTURE_ELEMENTS, APPARATUS_REQUIRED_ATTRIBUTES, validate_files
+from editem_apparatus.xml_backend import get_xml_backend
 
 ns = {'xml': 'http://www.w3.org/XML/1998/namespace'}
 
-rw = IOHandler()
+_NOT_IN_LANGUAGE = object()
+
+# the converter of an entity worker process, see ApparatusConverter._parse_elements
+_chunk_converter: Optional["ApparatusConverter"] = None
 
 
 @dataclass
@@ -40,118 +44,478 @@ class Dimensions:
     height: int
 
 
+@dataclass
+class ParsedEntityList:
+    list_id: Optional[str]
+    entity_dict: dict[str, Any]
+    entity_ids: list[str]
+    entity_tags: list[str]
+
+
+@dataclass
+class ParsedApparatus:
+    document: dict[str, Any]
+    entity_lists: list[ParsedEntityList] = field(default_factory=list)
+
+
+@dataclass
+class PipelineJob:
+    xml_file: str
+    converter: Optional["ApparatusConverter"] = None
+    xml_source: Optional[str] = None
+    parsed: Optional[ParsedApparatus] = None
+    error: Optional[str] = None
+    written: bool = False
+    started: float = 0.0
+
+    @property
+    def base_name(self) -> str:
+        return self.xml_file.removesuffix(".xml")
+
+
+PIPELINE_STAGES = ["read", "parse", "transform", "render", "write"]
+
+
 class ApparatusConverter:
     def __init__(self, config: EditemApparatusConfig):
         self.apparatus_directory = config.data_path.removesuffix("/")
         self.output_directory = config.export_path.removesuffix("/")
         self.graphic_url_mapper = config.graphic_url_mapper
         self.file_url_prefix = config.file_url_prefix
-        self.errors = []
+        self.log = ConversionLog(config.show_progress, config.log_file_path, config.event_log_path)
+        self.archive_path = config.archive_path
+        if config.archive_path:
+            self.rw = ArchiveIOHandler(config.archive_path, self.output_directory,
+                                       file_url_prefix=config.file_url_prefix, gzip_level=config.gzip_level,
+                                       log=self.log)
+        else:
+            self.rw = IOHandler(gzip_level=config.gzip_level, log=self.log)
+        self.validate = config.validate
+        self.search_index = config.search_index
+        self.page_size = config.page_size
+        self.html_fragments = config.html_fragments
+        self.change_feed = config.change_feed
+        self.xml_backend = get_xml_backend(config.xml_backend)
+        self.language_variants = config.language_variants or []
+        self.pipeline = config.pipeline
+        self.pipeline_workers = config.pipeline_workers or {}
+        unknown_stages = set(self.pipeline_workers) - set(PIPELINE_STAGES)
+        if unknown_stages:
+            raise ValueError(f"unknown pipeline stage(s): {', '.join(sorted(unknown_stages))},"
+                             f" expected {', '.join(PIPELINE_STAGES)}")
+        self.pipeline_queue_size = config.pipeline_queue_size
+        if config.table_format not in (None, "tsv", "csv"):
+            raise ValueError(f"unknown table format: {config.table_format}, expected tsv or csv")
+        self.table_format = config.table_format
+        self.relation_graph = config.relation_graph
+        self.thumbnail_widths = config.thumbnail_widths or []
+        if config.name_link_policy not in NAME_LINK_POLICIES:
+            raise ValueError(f"unknown name link policy: {config.name_link_policy},"
+                             f" expected {' or '.join(NAME_LINK_POLICIES)}")
+        self.collation_keys = config.collation_keys
+        self.name_link_policy = config.name_link_policy
+        if config.entity_workers < 1 or config.entity_chunk_size < 1:
+            raise ValueError("entity_workers and entity_chunk_size must be at least 1")
+        self.entity_workers = config.entity_workers
+        self.entity_chunk_size = config.entity_chunk_size
+        self.entity_pool = None
+        self.pipeline_stats: list[dict[str, Any]] = []
+        self._reset_conversion_state()
         self.illustration_sizes_file = config.illustration_sizes_file
         if config.illustration_sizes_file:
             self.illustration_dimensions = self._load_illustration_dimensions(config.illustration_sizes_file)
         else:
             self.illustration_dimensions = {}
-        if not config.show_progress:
-            logger.remove()
-            logger.add(sys.stderr, level="WARNING")
-        if config.log_file_path:
-            logger.remove()
-            if os.path.exists(config.log_file_path):
-                os.remove(config.log_file_path)
-            logger.add(config.log_file_path)
+
+    def _reset_conversion_state(self):
+        self.languages: set[str] = set()
+        self._reset_file_results()
+
+    def _reset_file_results(self):
+        self.errors = []
+        self.bio_entities: Optional[list[dict[str, Any]]] = None
+        self.entity_exports_with_refs: list[tuple[list[dict[str, Any]], str, str]] = []
+        self.entity_hashes: dict[str, dict[str, str]] = {}
+        self.entity_lists: list[tuple[str, ParsedEntityList, list[dict[str, Any]]]] = []
+        # counters of the file being converted, for the event log
+        self.file_counters: Counter[str] = Counter()
+
+    def _merge_file_results(self, other: "ApparatusConverter"):
+        self.errors.extend(other.errors)
+        if other.bio_entities is not None:
+            self.bio_entities = other.bio_entities
+        self.entity_exports_with_refs.extend(other.entity_exports_with_refs)
+        self.entity_hashes.update(other.entity_hashes)
+        self.entity_lists.extend(other.entity_lists)
 
     def convert(self) -> list[str]:
+        with self.log:
+            base_dir = self.apparatus_directory
+            xml_files = [xml for xml in os.listdir(base_dir) if xml.endswith(".xml")]
+            if self.validate and not self._is_valid([f"{base_dir}/{xml_file}" for xml_file in xml_files]):
+                return self.errors
+            # closing the io handler completes the archive, also when the conversion fails halfway
+            with self.rw:
+                with self._entity_pool():
+                    if self.pipeline:
+                        self._convert_with_pipeline(xml_files)
+                    else:
+                        self._convert_files(xml_files)
+                self._add_labels_to_refs()
+                if self.change_feed:
+                    self._export_change_feed([xml_file.removesuffix(".xml") for xml_file in xml_files])
+                if self.table_format:
+                    self._export_tables()
+                if self.relation_graph:
+                    self._export_relation_graph()
+            self.rw.report_generated_files()
+            return self.errors
+
+    @contextlib.contextmanager
+    def _entity_pool(self):
+        """With entity_workers > 1, provide the worker processes that parse the entities of large lists."""
+        if self.entity_workers == 1:
+            yield
+            return
+        from concurrent.futures import ProcessPoolExecutor
+
+        self.entity_pool = ProcessPoolExecutor(self.entity_workers, initializer=_init_chunk_worker)
+        try:
+            yield
+        finally:
+            self.entity_pool.shutdown()
+            self.entity_pool = None
+
+    def _convert_files(self, xml_files: list[str]):
         base_dir = self.apparatus_directory
-        xml_files = [xml for xml in os.listdir(base_dir) if xml.endswith(".xml")]
+        if not self.archive_path:
+            os.makedirs(self.output_directory, exist_ok=True)
+        if self._needs_project_languages():
+            self._collect_project_languages(xml_files)
         for xml_file in xml_files:
             try:
+                started = time.perf_counter()
+                self.file_counters = Counter()
                 base_name = xml_file.removesuffix(".xml")
-                export_dir = f"{self.output_directory}"
-                os.makedirs(export_dir, exist_ok=True)
-                self._process_xml(f"{base_dir}/{xml_file}", export_dir, base_name)
+                xml_source = self.rw.read_text(f"{base_dir}/{xml_file}")
+                self._transform_entities(self._parse_xml(xml_source, base_name), self.output_directory, base_name)
+                self._convert_to_html(xml_source, self.output_directory, base_name)
+                self._log_file_event(xml_file, started, self.file_counters)
             except Exception as e:
-                message = f"there was an error converting {xml_file}: {e}"
-                self.errors.append(message)
-                print(traceback.format_exc(), file=sys.stderr)
-        self._add_labels_to_refs()
-        rw.report_generated_files()
-        return self.errors
+                self._add_conversion_error(xml_file, e)
+
+    def _needs_project_languages(self) -> bool:
+        return bool(self.search_index or self.language_variants)
 
-    def _process_xml(self, xml_path: str, output_dir: str, base_name: str):
-        xml_source = rw.read_text(xml_path)
+    def _collect_project_languages(self, xml_files: list[str]):
+        """
+        The search index and the language variants of a file depend on the languages of the whole project,
+        so before any file is converted, all files are parsed once to collect those; the results are not kept.
+        Files that fail here are reported when they are converted.
+        """
+        for xml_file in xml_files:
+            try:
+                self._parse_xml(self.rw.read_text(f"{self.apparatus_directory}/{xml_file}"),
+                                xml_file.removesuffix(".xml"))
+            except Exception:
+                pass
+
+    def _add_conversion_error(self, xml_file: str, e: Exception):
+        message = f"there was an error converting {xml_file}: {e}"
+        self.errors.append(message)
+        print(traceback.format_exc(), file=sys.stderr)
+
+    def _convert_with_pipeline(self, xml_files: list[str]):
+        """
+        Convert the files in a pipeline of stages (read, parse, transform, render, write), so reading and writing
+        of some files overlaps with converting others.
+        Every file is converted by its own copy of the converter, which buffers its output until the write stage;
+        its results are merged back in the order of `xml_files`, so the outcome is the same as converting the
+        files one by one.
+        """
+        from editem_apparatus.pipeline import Pipeline, Stage
+
+        if not self.archive_path:
+            os.makedirs(self.output_directory, exist_ok=True)
+        steps = [self._read_step, self._parse_step, self._transform_step, self._render_step, self._write_step]
+        stages = [Stage(name, self._pipeline_step(step), self.pipeline_workers.get(name, 1))
+                  for name, step in zip(PIPELINE_STAGES, steps)]
+        if self._needs_project_languages():
+            # like `_collect_project_languages`, but reading and parsing in the pipeline
+            language_stages = [Stage("read", self._pipeline_step(self._read_step, quiet=True), stages[0].workers),
+                               Stage("parse", self._pipeline_step(self._language_step, quiet=True), stages[1].workers)]
+            Pipeline(language_stages, queue_size=self.pipeline_queue_size).run(
+                PipelineJob(xml_file) for xml_file in xml_files)
+        jobs = [PipelineJob(xml_file) for xml_file in xml_files]
+        stats = Pipeline(stages, queue_size=self.pipeline_queue_size).run(jobs)
+        self.pipeline_stats = [s.as_dict() for s in stats]
+        for s in self.pipeline_stats:
+            self.log.info("pipeline stage {}: {}", lambda s=s: s['stage'], lambda s=s: s)
+        for job in jobs:
+            if job.error:
+                self.errors.append(job.error)
+            elif job.written:
+                self._merge_file_results(job.converter)
 
+    @staticmethod
+    def _pipeline_step(step, quiet: bool = False):
+        def run_step(job: PipelineJob) -> Optional[PipelineJob]:
+            try:
+                step(job)
+                return job
+            except Exception as e:
+                job.error = f"there was an error converting {job.xml_file}: {e}"
+                if not quiet:
+                    print(traceback.format_exc(), file=sys.stderr)
+                return None
+
+        return run_step
+
+    def _read_step(self, job: PipelineJob):
+        job.started = time.perf_counter()
+        job.xml_source = self.rw.read_text(f"{self.apparatus_directory}/{job.xml_file}")
+
+    def _parse_step(self, job: PipelineJob):
+        converter = copy.copy(self)
+        converter.rw = BufferedIOHandler(log=self.log)
+        converter._reset_file_results()
+        job.converter = converter
+        job.parsed = converter._parse_xml(job.xml_source, job.base_name)
+
+    def _language_step(self, job: PipelineJob):
+        # parsing adds the languages of the file to the (shared) languages of the project
+        self._parse_xml(job.xml_source, job.base_name)
+        job.xml_source = None
+
+    def _transform_step(self, job: PipelineJob):
+        job.converter._transform_entities(job.parsed, self.output_directory, job.base_name)
+        job.parsed = None
+
+    def _render_step(self, job: PipelineJob):
+        job.converter._convert_to_html(job.xml_source, self.output_directory, job.base_name)
+        job.xml_source = None
+
+    def _write_step(self, job: PipelineJob):
+        job.converter.rw.flush(self.rw)
+        job.written = True
+        self._log_file_event(job.xml_file, job.started, job.converter.file_counters)
+
+    def _log_file_event(self, xml_file: str, started: float, counters: Counter[str]):
+        self.log.event("file", file=xml_file, seconds=round(time.perf_counter() - started, 6), **counters)
+
+    def _is_valid(self, xml_paths: list[str]) -> bool:
+        problems = validate_files(xml_paths, APPARATUS_REQUIRED_ATTRIBUTES, APPARATUS_CAPTURE_ELEMENTS)
+        for problem in problems:
+            self.log.error(problem)
+        self.errors.extend(problems)
+        return not problems
+
+    def convert_source(self, xml_source: Union[str, bytes], base_name: str) -> tuple[dict[str, Any], list[str]]:
+        """
+        Convert a single apparatus xml document in memory, without touching the filesystem.
+        Returns the generated outputs (json data or html) by file name, and the errors.
+        The converter itself is not changed, so it can be reused for other conversions.
+        """
+        converter = copy.copy(self)
+        converter.rw = MemoryIOHandler(self.output_directory)
+        converter._reset_conversion_state()
+        converter._process_source(xml_source, self.output_directory, base_name)
+        converter._add_labels_to_refs()
+        if self.table_format:
+            converter._export_tables()
+        if self.relation_graph:
+            converter._export_relation_graph()
+        return converter.rw.files, converter.errors
+
+    def _process_source(self, xml_source: Union[str, bytes], output_dir: str, base_name: str):
         self._convert_to_json(xml_source, output_dir, base_name)
         self._convert_to_html(xml_source, output_dir, base_name)
 
-    def _convert_to_json(self, xml: str, output_dir: str, base_name: str):
-        # export json conversion of complete xml file
+    def _convert_to_json(self, xml: Union[str, bytes], output_dir: str, base_name: str):
+        self._transform_entities(self._parse_xml(xml, base_name), output_dir, base_name)
+
+    def _parse_xml(self, xml: Union[str, bytes], base_name: str) -> ParsedApparatus:
+        import xmltodict
+
         xpars = xmltodict.parse(xml)
-        element_dict = self._simplify_keys(list(xpars.values())[0])
-        path = f"{output_dir}/{base_name}.json"
-        rw.write_json(path, element_dict)
+        parsed = ParsedApparatus(document=self._simplify_keys(list(xpars.values())[0]))
 
         list_elements = []
-        root = ET.fromstring(xml)
-        text_node = root.find(".//{http://www.tei-c.org/ns/1.0}text")
+        root = self.xml_backend.parse(xml)
+        text_node = self.xml_backend.text_node(root)
         if text_node is not None:
-            list_tags = ["listObject", "listBibl", "listPerson"]
-            list_elements = list(
-                itertools.chain.from_iterable(
-                    [text_node.findall(".//{http://www.tei-c.org/ns/1.0}" + lt, namespaces=ns) for lt in list_tags]
-                )
-            )
+            list_elements = self.xml_backend.list_elements(text_node)
             if not list_elements:
                 list_elements = [text_node]
 
-        all_entity_dict = {}
-        entities_were_split = False
         for list_element in [le for le in list_elements if le is not None]:
-            xml_id = list_element.attrib.get(f'{{{ns["xml"]}}}id')
-            if xml_id:
-                typed_base_name = f"{base_name}.{xml_id}"
-                entities_were_split = True
-            else:
-                typed_base_name = base_name
-
-            # export all elements with xml:id to json files
-            identified_elements = list_element.findall(".//*[@xml:id]", namespaces=ns)
+            # all elements with xml:id
+            identified_elements = self.xml_backend.identified_elements(list_element)
             entity_dict: dict[str, Any] = {}
             entity_id_list: list[str] = []
+            entity_tags: list[str] = []
             relevant_identified_elements = [ie for ie in identified_elements if
                                             ie.tag != "{http://www.tei-c.org/ns/1.0}listObject"]
-            for element in relevant_identified_elements:
-                xml_id = element.attrib.get(f'{{{ns["xml"]}}}id')
-                if xml_id is not None:
-                    xml_str = ET.tostring(element, encoding='UTF-8')
-                    parsed_dict = xmltodict.parse(xml_str)
-                    element_dict = self._simplify_keys(list(parsed_dict.values())[0])
-                    # filepath = os.path.join(output_dir, f"{xml_id}.json")
-                    # logger.info(f"=> {filepath}")
-                    # with open(filepath, 'w') as f:
-                    #     json.dump(element_dict, fp=f, indent=2, ensure_ascii=False)
-                    entity_dict[f"{base_name}/{xml_id}"] = element_dict
-                    entity_id_list.append(xml_id)
+            elements = [(element.attrib.get(f'{{{ns["xml"]}}}id'), element)
+                        for element in relevant_identified_elements]
+            elements = [(xml_id, element) for xml_id, element in elements if xml_id is not None]
+            element_dicts = self._parse_elements([self.xml_backend.tostring(element) for _, element in elements])
+            for (xml_id, element), element_dict in zip(elements, element_dicts):
+                entity_dict[f"{base_name}/{xml_id}"] = element_dict
+                entity_id_list.append(xml_id)
+                entity_tags.append(element.tag.split("}")[-1])
+            list_id = list_element.attrib.get(f'{{{ns["xml"]}}}id')
+            entity_dict = self._convert_all_object_lists_with_lang_fields_to_dict(entity_dict)
+            parsed.entity_lists.append(ParsedEntityList(list_id, entity_dict, entity_id_list, entity_tags))
+        return parsed
+
+    def _parse_elements(self, xml_strings: list[bytes]) -> list[dict[str, Any]]:
+        """
+        Parse and simplify the elements of an entity list. The elements of a list larger than entity_chunk_size
+        are parsed in chunks by the entity workers; the results are in the same order as `xml_strings`.
+        """
+        if self.entity_pool is None or len(xml_strings) <= self.entity_chunk_size:
+            return [self._parse_element(xml_string) for xml_string in xml_strings]
+        size = self.entity_chunk_size
+        chunks = [xml_strings[i:i + size] for i in range(0, len(xml_strings), size)]
+        self.log.info("parsing {} entities in {} chunks", lambda: len(xml_strings), lambda: len(chunks))
+        return list(itertools.chain.from_iterable(self.entity_pool.map(_parse_entity_chunk, chunks)))
+
+    def _parse_element(self, xml_string: bytes) -> dict[str, Any]:
+        import xmltodict
+
+        return self._simplify_keys(list(xmltodict.parse(xml_string).values())[0])
+
+    def _transform_entities(self, parsed: ParsedApparatus, output_dir: str, base_name: str):
+        from toolz import pipe
+
+        # export json conversion of complete xml file
+        path = f"{output_dir}/{base_name}.json"
+        self._export_as_json(parsed.document, path)
+
+        all_entity_dict = {}
+        entities_were_split = False
+        for entity_list in parsed.entity_lists:
+            if entity_list.list_id:
+                typed_base_name = f"{base_name}.{entity_list.list_id}"
+                entities_were_split = True
+            else:
+                typed_base_name = base_name
 
             converted_entity_dict = pipe(
-                entity_dict,
-                self._convert_all_object_lists_with_lang_fields_to_dict,
+                entity_list.entity_dict,
                 self._normalize_list_values,
                 self._add_labels_for_persons,
+                self._add_collation_keys,
                 self._extend_graphic_annotation,
                 self._convert_source_to_list,
                 self._convert_relation_to_list
             )
             all_entity_dict.update(converted_entity_dict)
-            self._export_as_json([converted_entity_dict[f"{base_name}/{k}"] for k in entity_id_list],
-                                 f"{output_dir}/{typed_base_name}-entities.json")
-            # TODO: sanity check on uniqueness of facet labels
+            entities = [converted_entity_dict[f"{base_name}/{k}"] for k in entity_list.entity_ids]
+            self.file_counters["entityLists"] += 1
+            self.file_counters["entities"] += len(entities)
+            if self.table_format or self.relation_graph:
+                self.entity_lists.append((base_name, entity_list, entities))
+            self._export_entities(entities, f"{output_dir}/{typed_base_name}", base_name)
+            if self.search_index:
+                self._check_facet_label_uniqueness(entities, f"{typed_base_name}-entities.json")
         self._export_as_json(all_entity_dict, f"{output_dir}/{base_name}-entity-dict.json")
+        for lang in self.language_variants:
+            self._export_as_json({k: self._language_variant(v, lang) for k, v in all_entity_dict.items()},
+                                 f"{output_dir}/{base_name}-entity-dict.{lang}.json")
+        self._record_entity_hashes(base_name, {k.removeprefix(f"{base_name}/"): v for k, v in all_entity_dict.items()})
         if entities_were_split:
-            self._export_as_json(list(all_entity_dict.values()), f"{output_dir}/{base_name}-entities.json")
+            self._export_entities(list(all_entity_dict.values()), f"{output_dir}/{base_name}", base_name)
+
+    def _export_as_json(self, data: Any, path: str) -> int:
+        return self._counted_output(self.rw.write_json(path, data))
+
+    def _export_as_text(self, text: str, path: str) -> int:
+        return self._counted_output(self.rw.write_text(path, text))
+
+    def _counted_output(self, size: int) -> int:
+        self.file_counters["outputs"] += 1
+        self.file_counters["outputBytes"] += size
+        return size
+
+    def _export_entities(self, entities: list[dict[str, Any]], path_base: str, base_name: str):
+        name = os.path.basename(path_base)
+        if name == "bio":
+            self.bio_entities = entities
+        if name.startswith("artwork."):
+            # the relation refs in these get a label in _add_labels_to_refs,
+            # so export them when all bio labels are known
+            self.entity_exports_with_refs.append((entities, path_base, base_name))
+        else:
+            self._write_entities(entities, path_base)
+
+    def _write_entities(self, entities: list[dict[str, Any]], path_base: str):
+        self._export_as_json(entities, f"{path_base}-entities.json")
+        if self.collation_keys:
+            order = sorted(range(len(entities)), key=lambda i: entities[i]["collationKey"])
+            self._export_as_json({"byCollationKey": order}, f"{path_base}-entities.order.json")
+        for lang in self.language_variants:
+            self._export_as_json([self._language_variant(e, lang) for e in entities],
+                                 f"{path_base}-entities.{lang}.json")
+        if self.search_index:
+            self._export_as_json(build_search_index(entities, self.languages), f"{path_base}-search-index.json")
+        if self.page_size:
+            self._export_entity_pages(entities, path_base)
+
+    def _export_entity_pages(self, entities: list[dict[str, Any]], path_base: str):
+        name = os.path.basename(path_base)
+        sorted_entities = sorted(entities, key=self._sort_key)
+        pages = []
+        for page_index in range(0, len(sorted_entities), self.page_size):
+            page_entities = sorted_entities[page_index:page_index + self.page_size]
+            page_file = f"{name}-entities.page-{len(pages) + 1:04d}.json"
+            size = self._export_as_json(page_entities, f"{os.path.dirname(path_base)}/{page_file}")
+            pages.append({
+                "file": page_file,
+                "count": len(page_entities),
+                "firstId": page_entities[0].get("id"),
+                "lastId": page_entities[-1].get("id"),
+                "firstLabel": self._label_for_sorting(page_entities[0]),
+                "lastLabel": self._label_for_sorting(page_entities[-1]),
+                "bytes": size
+            })
+        manifest = {
+            "pageSize": self.page_size,
+            "count": len(sorted_entities),
+            "pages": pages
+        }
+        self._export_as_json(manifest, f"{path_base}-entities.manifest.json")
+
+    def _language_variant(self, value: Any, lang: str) -> Any:
+        # keep only the `lang` value of every language map; fields without a value in that language are left out
+        if is_lang_map(value, self.languages | {lang}):
+            return value.get(lang, _NOT_IN_LANGUAGE)
+        if isinstance(value, dict):
+            variant = {k: self._language_variant(v, lang) for k, v in value.items()}
+            return {k: v for k, v in variant.items() if v is not _NOT_IN_LANGUAGE}
+        if isinstance(value, list):
+            variant = [self._language_variant(v, lang) for v in value]
+            return [v for v in variant if v is not _NOT_IN_LANGUAGE]
+        return value
 
-    def _export_as_json(self, data: Any, path: str):
-        rw.write_json(path, data)
+    def _sort_key(self, entity: dict[str, Any]) -> str:
+        if self.collation_keys:
+            return entity["collationKey"]
+        return self._label_for_sorting(entity).casefold()
+
+    @staticmethod
+    def _label_for_sorting(entity: dict[str, Any]) -> str:
+        for key in ("sortLabel", "displayLabel", "id"):
+            if isinstance(entity.get(key), str):
+                return entity[key]
+        return ""
+
+    def _check_facet_label_uniqueness(self, entities: list[dict[str, Any]], file_name: str):
+        for label, ids in find_duplicate_labels(entities).items():
+            error = f"duplicate facet label \"{label}\" in {file_name} for ids: {', '.join(ids)}"
+            self.log.error(error)
+            self.errors.append(error)
 
     def _simplify_keys(self, kv_dict: dict[str, Any]) -> dict[str, Any]:
         new_dict = {}
@@ -173,7 +537,8 @@ class ApparatusConverter:
         return new_dict
 
     def _is_lang_type_object_list(self, value: Any) -> bool:
-        return self._is_lang_object_list(value) and "type" in value[0]
+        # items without a lang are in all languages, but every item needs a type
+        return self._is_lang_object_list(value) and all(isinstance(i, dict) and "type" in i for i in value)
 
     def _is_lang_type_object(self, value: Any) -> bool:
         return self._is_lang_object(value) and "type" in value
@@ -181,6 +546,9 @@ class ApparatusConverter:
     def _is_lang_object_list(self, value: Any) -> bool:
         return isinstance(value, list) and self._is_lang_object(value[0])
 
+    def _is_complete_lang_object_list(self, value: Any) -> bool:
+        return self._is_lang_object_list(value) and all(self._is_lang_object(i) for i in value)
+
     @staticmethod
     def _is_lang_object(value: Any) -> bool:
         return isinstance(value, dict) and "lang" in value
@@ -190,23 +558,27 @@ class ApparatusConverter:
             out_dict = {}
             for i in in_value:
                 langs = [i["lang"]] if "lang" in i else ["nl", "en"]
+                self.languages.update(langs)
                 o_type = i.pop("type")
                 i.pop("lang", None)
                 simplified = self._simplify(i)
                 for lang in langs:
                     out_dict.setdefault(lang, {})[o_type] = simplified
             return out_dict
-        elif self._is_lang_object_list(in_value):
+        elif self._is_complete_lang_object_list(in_value):
             out_dict = {}
             for i in in_value:
+                self.languages.add(i["lang"])
                 out_dict[i.pop("lang")] = self._simplify(i)
             return out_dict
         elif self._is_lang_type_object(in_value):
             lang = in_value.pop("lang")
+            self.languages.add(lang)
             o_type = in_value.pop("type")
             return {lang: {o_type: self._simplify(in_value)}}
         elif self._is_lang_object(in_value):
             lang = in_value.pop("lang")
+            self.languages.add(lang)
             return {lang: self._simplify(in_value)}
         else:
             return in_value
@@ -243,7 +615,7 @@ class ApparatusConverter:
                     current[last_key] = [value]
 
         list_value_keys = self._find_keys_with_list_values(in_dict)
-        logger.info(f"fields with list values: {list_value_keys}")
+        self.log.info("fields with list values: {}", lambda: list_value_keys)
         for d in in_dict.values():
             for key in list_value_keys:
                 _set_value_as_list(d, key)
@@ -276,33 +648,68 @@ class ApparatusConverter:
                 if len("".join(
                         [normalized_pers_name.forename, normalized_pers_name.name_link, normalized_pers_name.surname,
                          normalized_pers_name.add_name, normalized_pers_name.gen_name])) == 0:
-                    logger.warning(
+                    self.log.warning(
                         f"no nameparts (forename, surname, etc.) found in Person #{entity_id}, using fullname for displayLabel/sortLabel")
                 entity["displayLabel"] = self._display_label(normalized_pers_name)
                 entity["sortLabel"] = self._sort_label(normalized_pers_name)
             new_dict[entity_id] = entity
         return new_dict
 
+    def _add_collation_keys(self, entity_dict: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        if self.collation_keys:
+            for entity in entity_dict.values():
+                if "persName" in entity:
+                    name = self._normalized(self._preferred_pers_name(entity["persName"]))
+                    entity["collationKey"] = person_collation_key(
+                        name.forename, name.name_link, name.surname, name.add_name, name.gen_name, name.full_name,
+                        self.name_link_policy)
+                else:
+                    entity["collationKey"] = fold(self._label_for_sorting(entity))
+        return entity_dict
+
     def _extend_graphic_annotation(self, entity_dict: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
         if self.graphic_url_mapper and self.illustration_dimensions:
             new_dict = {}
             for entity_id, entity in entity_dict.items():
                 if "graphic" in entity and ("url" in entity["graphic"]):
                     graphic_url = entity["graphic"]["url"]
+                    xml_file = f"{entity_id.split('/')[0]}.xml"
                     entity["graphic"]["url"] = self.graphic_url_mapper(graphic_url)
                     if graphic_url in self.illustration_dimensions:
                         dimensions = self.illustration_dimensions[graphic_url]
                         entity["graphic"]["width"] = dimensions.width
                         entity["graphic"]["height"] = dimensions.height
+                        if self.thumbnail_widths and dimensions.width > 0 and dimensions.height > 0:
+                            self._add_iiif_size_hints(entity["graphic"], dimensions)
+                        elif self.thumbnail_widths:
+                            self._add_graphic_problem(
+                                f"zero width/height in {self.illustration_sizes_file}, no iiif size hints",
+                                graphic_url, xml_file)
                     else:
-                        msg = f"missing width/height: no illustration dimensions found in {self.illustration_sizes_file} for <graphic url=\"{graphic_url}\"/>: no entry for file {graphic_url}"
-                        logger.warning(msg)
-                        self.errors.append(msg)
+                        self._add_graphic_problem(
+                            f"missing width/height: no illustration dimensions found in {self.illustration_sizes_file}",
+                            graphic_url, xml_file)
                 new_dict[entity_id] = entity
             return new_dict
         else:
             return entity_dict
 
+    def _add_graphic_problem(self, message: str, graphic_url: str, xml_file: str):
+        # one error per graphic, but a single (aggregated) warning in the log for all graphics with the same problem
+        self.errors.append(f"{message} for <graphic url=\"{graphic_url}\"/> in {xml_file}")
+        self.log.aggregate_warning(f"{message} for graphic urls", f"{graphic_url} ({xml_file})")
+
+    def _add_iiif_size_hints(self, graphic: dict[str, Any], dimensions: Dimensions):
+        # the sizes (and urls) the iiif image server will return for the thumbnail widths, without upscaling,
+        # so clients don't need to fetch info.json to lay out and load the thumbnails
+        graphic["aspectRatio"] = round(dimensions.width / dimensions.height, 4)
+        widths = sorted({min(w, dimensions.width) for w in self.thumbnail_widths})
+        graphic["sizes"] = [{
+            "width": w,
+            "height": round(dimensions.height * w / dimensions.width),
+            "url": f"{graphic['url']}/full/{w},/0/default.jpg"
+        } for w in widths]
+
     @staticmethod
     def _convert_source_to_list(entity_dict: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
         new_dict = {}
@@ -328,7 +735,7 @@ class ApparatusConverter:
         elif len(pers_names) == 1:
             return pers_names[0]
         else:
-            abbs = [pn for pn in pers_names if pn["full"] == "abb"]
+            abbs = [pn for pn in pers_names if pn.get("full") == "abb"]
             if abbs:
                 abb = abbs[0]
                 if "forename" in abb:
@@ -393,7 +800,7 @@ class ApparatusConverter:
                 if isinstance(surnames[1], str):
                     return f"{surnames[0]} ({surnames[1]})"
                 else:
-                    return f"{surnames[0]} ({surnames[1]['text']})"
+                    return f"{surnames[0]} ({surnames[1].get('text', '')})"
             else:
                 return ""
         else:
@@ -411,36 +818,128 @@ class ApparatusConverter:
                         relation[i]["label"] = label4ref[ref]
                     else:
                         error = f"invalid ref: {ref} for artwork.xml#{entity['id']}"
-                        logger.error(error)
+                        self.log.error(error)
                         self.errors.append(error)
                         relation[i]["label"] = f"!no label found for ref {ref}"
         return entity
 
     def _add_labels_to_refs(self):
-        # load bio-entities
-        label_for_ref = {}
+        # use the bio-entities from this run, or from a previous run when bio.xml was not converted now
+        bio_entities = self.bio_entities
         bio_path = f"{self.output_directory}/bio-entities.json"
-        if os.path.exists(bio_path):
-            bio_entities = rw.read_json(bio_path)
-            label_for_ref = {f"bio.xml#{b['id']}": b["displayLabel"] for b in bio_entities}
-
-        # rewrite artwork.*-entities.json, add label to relation.ref elements
-        artwork_paths = glob.glob(f"{self.output_directory}/artwork.*-entities.json")
-        for artwork_path in artwork_paths:
-            artwork_entities = rw.read_json(artwork_path)
+        if bio_entities is None and self.rw.exists(bio_path):
+            bio_entities = self.rw.read_json(bio_path)
+        # only persons (with a persName) have a label
+        label_for_ref = {f"bio.xml#{b['id']}": b["displayLabel"] for b in bio_entities or [] if "displayLabel" in b}
+
+        # export artwork.*-entities.json, add label to relation.ref elements
+        for artwork_entities, path_base, base_name in self.entity_exports_with_refs:
             new_artwork_entities = [self._add_label_to_ref(a, label_for_ref) for a in
                                     artwork_entities]
-            rw.write_json(artwork_path, new_artwork_entities)
+            self._write_entities(new_artwork_entities, path_base)
+            self._record_entity_hashes(base_name, {a["id"]: a for a in new_artwork_entities})
+        self.entity_exports_with_refs = []
+
+    def _record_entity_hashes(self, base_name: str, entity_for_id: dict[str, dict[str, Any]]):
+        if self.change_feed:
+            from editem_apparatus.change_feed import content_hash
+
+            hashes = self.entity_hashes.setdefault(base_name, {})
+            for entity_id, entity in entity_for_id.items():
+                hashes[entity_id] = content_hash(entity)
+
+    def _export_change_feed(self, base_names: list[str]):
+        from editem_apparatus.change_feed import compute_changes
+
+        hashes_path = f"{self.output_directory}/entity-hashes.json"
+        previous_hashes = self.rw.read_json(hashes_path) if self.rw.exists(hashes_path) else {}
+        # keep the previous hashes of files that failed to convert in this run, so they don't show up as removed
+        current_hashes = {b: previous_hashes[b] for b in base_names if b in previous_hashes}
+        current_hashes.update(self.entity_hashes)
+        self._export_as_json(compute_changes(previous_hashes, current_hashes),
+                             f"{self.output_directory}/entity-changes.json")
+        self._export_as_json(current_hashes, hashes_path)
+
+    def _export_tables(self):
+        # sorted by file name, so the rows do not depend on the order in which the files were converted
+        entity_lists = sorted(self.entity_lists, key=lambda e: e[0])
+        rows = {
+            "persons": self._table_rows(entity_lists, "person", self._person_row),
+            "bibls": self._table_rows(entity_lists, "bibl", bibl_row),
+            "objects": self._table_rows(entity_lists, "object", object_row),
+            "relations": (row for base_name, _, entities in entity_lists
+                          for row in relation_rows(entities, f"{base_name}.xml")),
+        }
+        write_table = self.rw.write_tsv if self.table_format == "tsv" else self.rw.write_csv
+        for table, columns in TABLES.items():
+            write_table(f"{self.output_directory}/{table}.{self.table_format}", columns, rows[table])
+
+    def _export_relation_graph(self):
+        from editem_apparatus.relation_graph import build_relation_graph
+
+        # sorted by file name, like the tables
+        entity_lists = sorted(self.entity_lists, key=lambda e: e[0])
+        nodes = ((f"{base_name}.xml#{entity['id']}", tag) for base_name, entity_list, entities in entity_lists
+                 for tag, entity in zip(entity_list.entity_tags, entities))
+        relations = ((source, name or "", self._absolute_ref(target, source))
+                     for base_name, _, entities in entity_lists
+                     for source, name, target, _ in relation_rows(entities, f"{base_name}.xml"))
+        graph = build_relation_graph(nodes, relations)
+        self.log.info("relation graph: {} nodes, {} edges", lambda: len(graph["nodes"]["ids"]),
+                      lambda: len(graph["forward"]["targets"]))
+        self._export_as_json(graph, f"{self.output_directory}/relation-graph.json")
+
+    @staticmethod
+    def _absolute_ref(ref: str, source: str) -> str:
+        # a ref to an entity in the same file (`#id`) gets the file of the source
+        return f"{source.split('#')[0]}{ref}" if ref.startswith("#") else ref
 
-    def _convert_to_html(self, xml_string: str, output_dir: str, base_name: str) -> None:
-        # toc = _head
-        handler = ApparatusHandler()
+    @staticmethod
+    def _table_rows(entity_lists: list[tuple[str, ParsedEntityList, list[dict[str, Any]]]], tag: str,
+                    row) -> Iterator[list[Any]]:
+        for base_name, entity_list, entities in entity_lists:
+            for entity_tag, entity in zip(entity_list.entity_tags, entities):
+                if entity_tag == tag:
+                    yield row(entity, f"{base_name}.xml", entity_list.list_id)
+
+    def _person_row(self, entity: dict[str, Any], file: str, list_id: Optional[str]) -> list[Any]:
+        name = self._normalized(self._preferred_pers_name(entity["persName"])) if "persName" in entity else None
+        name_parts = [name.forename, name.name_link, name.surname, name.add_name, name.gen_name] if name else [None] * 5
+        return ([entity.get("id"), file, list_id, entity.get("displayLabel"), entity.get("sortLabel")]
+                + [text_value(p) or None for p in name_parts]
+                + [text_value(entity.get(f)) for f in ("sex", "birth", "death")])
+
+    def _convert_to_html(self, xml_string: Union[str, bytes], output_dir: str, base_name: str) -> None:
+        import xml.sax
+
+        from editem_apparatus.apparatus_handler import ApparatusHandler
+
+        handler = ApparatusHandler(collect_fragments=self.html_fragments)
         xml.sax.parseString(xml_string, handler)
         path = f"{output_dir}/{base_name}.html"
-        rw.write_text(path, handler.html_string)
+        self._export_as_text(handler.html_string, path)
+        if self.html_fragments:
+            self._export_html_fragments(handler.fragments, output_dir, base_name)
+
+    def _export_html_fragments(self, fragments: list[dict[str, Any]], output_dir: str, base_name: str) -> None:
+        toc = []
+        for fragment in fragments:
+            fragment_file = f"{base_name}.{fragment['id']}.html"
+            size = self._export_as_text(fragment["html"], f"{output_dir}/{fragment_file}")
+            toc.append({
+                "id": fragment["id"],
+                "type": fragment["type"],
+                "head": fragment["head"],
+                "parent": fragment["parent"],
+                "file": fragment_file,
+                "bytes": size
+            })
+        self._export_as_json(toc, f"{output_dir}/{base_name}-toc.json")
 
     @staticmethod
     def _load_illustration_dimensions(illustration_sizes_file: str) -> dict[str, Dimensions]:
+        import csv
+
         illustration_dimensions: dict[str, Dimensions] = {}
         if illustration_sizes_file is not None:
             with open(illustration_sizes_file, encoding='utf8') as f:
@@ -449,50 +948,25 @@ class ApparatusConverter:
         return illustration_dimensions
 
 
+def iiif_graphic_url(url: str, base_url: str, project: str) -> str:
+    base = f"{base_url}/{project}|illustrations|{url}"
+    if "." in url:  # some projects add the extension
+        return base
+    return f"{base}.jpg"  # others don't, guess jpg extension
+
+
+def _init_chunk_worker():
+    global _chunk_converter
+    _chunk_converter = ApparatusConverter(
+        EditemApparatusConfig(project_name="", data_path="", export_path="", validate=False))
+
+
+def _parse_entity_chunk(xml_strings: list[bytes]) -> list[dict[str, Any]]:
+    return [_chunk_converter._parse_element(xml_string) for xml_string in xml_strings]
+
+
 def main():
-    parser = ArgumentParser(
-        description="Extract structured data from editem apparatus tei xml",
-        formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument('-p', '--project', help="Project name", type=str, required=True)
-    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
-    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
-    parser.add_argument('-b', '--base-url', help="URL for the IIIF image server (scheme + server + prefix)", type=str,
-                        required=True)
-    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
-    parser.add_argument('-s', '--sizes', help="Illustration sizes file", type=str)
-    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
-    args = parser.parse_args()
-
-    if args.ignore_errors:
-        logger.remove()
-        logger.add(sink=sys.stderr, level="WARNING")
-
-    def url_mapper(url):
-        base = f"{args.base_url}/{args.project}|illustrations|{url}"
-        if "." in url:  # some projects add the extension
-            return base
-        return f"{base}.jpg"  # others don't, guess jpg extension
-
-    config = EditemApparatusConfig(
-        project_name=args.project,
-        data_path=args.inputdir,
-        export_path=args.outputdir,
-        show_progress=False,
-        graphic_url_mapper=url_mapper,
-        log_file_path=args.logfile,
-        illustration_sizes_file=args.sizes,
-    )
-
-    errors = ApparatusConverter(config).convert()
-    if errors:
-        for error in errors:
-            logger.error(error)
-        if args.ignore_errors:
-            sys.exit(0)
-        else:
-            sys.exit(1)
-    else:
-        sys.exit(0)
+    apparatus_main()
 
 
 if __name__ == '__main__':
@@ -5,13 +5,22 @@ from xml.sax import ContentHandler
 from editem_apparatus.utils import linkify_urls
 
 
+FRAGMENT_TAGS = ["listBibl", "bibl"]
+
+
 class ApparatusHandler(ContentHandler):
-    def __init__(self):
+    def __init__(self, collect_fragments: bool = False):
         self.html_string = ""
         self.capture = False
         self.parent_tag_stack = deque()
         self.close_tags = {}
         self.unhandled_tags = set()
+        # with collect_fragments, the html of every listBibl/bibl with an xml:id is also kept as a separate fragment
+        self.collect_fragments = collect_fragments
+        self.fragments = []
+        self.open_fragments = deque()
+        self.head_fragment = None
+        self.head_depth = 0
 
     def startDocument(self):
         pass
@@ -22,6 +31,9 @@ class ApparatusHandler(ContentHandler):
             self.html_string += f"\n<!--\nunhandled tags:\n  {unhandled_tags_list}\n-->"
 
     def startElement(self, name, attrs):
+        if self.collect_fragments and self.capture:
+            self._start_fragment(name, attrs)
+
         if name == "titleStmt" or name == "body":
             self.capture = True
 
@@ -95,6 +107,8 @@ class ApparatusHandler(ContentHandler):
 
     def endElement(self, name):
         self.parent_tag_stack.pop()
+        if self.head_fragment is not None and self.head_depth == len(self.parent_tag_stack):
+            self.head_fragment = None
 
         if name == "body" or name == "titleStmt":
             self.capture = False
@@ -107,10 +121,34 @@ class ApparatusHandler(ContentHandler):
                     # if self.close_tags:
                     #     ic(tag, self.close_tags)
                     self.html_string += f"<!-- close {name} -->\n"
+                if self.collect_fragments:
+                    self._end_fragment()
 
     def characters(self, content):
         if self.capture:
             self.html_string += linkify_urls(html.escape(content))
+            if self.head_fragment is not None:
+                self.head_fragment["head"] += content
 
     def processingInstruction(self, target, data):
         pass
+
+    def _start_fragment(self, name, attrs):
+        depth = len(self.parent_tag_stack)
+        if name in FRAGMENT_TAGS and 'xml:id' in attrs:
+            parent = self.open_fragments[-1][0]["id"] if self.open_fragments else None
+            fragment = {"id": attrs["xml:id"], "type": name, "head": None, "parent": parent, "html": ""}
+            self.fragments.append(fragment)
+            self.open_fragments.append((fragment, depth, len(self.html_string)))
+        elif name == "head" and self.open_fragments and self.open_fragments[-1][0]["head"] is None:
+            # the first head in a fragment is used as its title in the toc
+            self.head_fragment = self.open_fragments[-1][0]
+            self.head_fragment["head"] = ""
+            self.head_depth = depth
+
+    def _end_fragment(self):
+        if self.open_fragments and self.open_fragments[-1][1] == len(self.parent_tag_stack):
+            fragment, _, start = self.open_fragments.pop()
+            fragment["html"] = self.html_string[start:]
+            if fragment["head"] is not None:
+                fragment["head"] = " ".join(fragment["head"].split())
@@ -0,0 +1,129 @@
+"""
+Convert the apparatus (and optionally the menu and home config) of several projects in one invocation.
+
+The projects are listed in a toml file:
+
+    workers = 4
+
+    [[project]]
+    name = "israels"
+    inputdir = "data/israels-apparatus"
+    outputdir = "out/israels"
+    base_url = "https://preview.dev.diginfra.org/iiif/3"
+    sizes = "data/israels/sizes_illustrations.tsv"
+    # optional: convert menu.xml and home.xml from this directory too
+    config_inputdir = "data/israels-config"
+    # any other EditemApparatusConfig field can be set as well, e.g.
+    search_index = true
+
+All conversions share one pool of worker processes; every project gets its own error report.
+"""
+import tomllib
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields
+from functools import partial
+from typing import Any, Optional
+
+from editem_apparatus.apparatus_converter import ApparatusConverter, iiif_graphic_url
+from editem_apparatus.cli import batch_main
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.home_converter import HomeConverter
+from editem_apparatus.menu_converter import MenuConverter
+
+PROJECT_KEYS = {"name", "inputdir", "outputdir", "base_url", "sizes", "config_inputdir", "config_outputdir"}
+
+
+@dataclass
+class ProjectReport:
+    name: str
+    errors: list[str] = field(default_factory=list)
+
+
+def load_projects(path: str) -> tuple[list[dict[str, Any]], Optional[int]]:
+    with open(path, 'rb') as f:
+        batch_config = tomllib.load(f)
+    return batch_config.get("project", []), batch_config.get("workers")
+
+
+def apparatus_config(project: dict[str, Any]) -> EditemApparatusConfig:
+    config_fields = {f.name for f in fields(EditemApparatusConfig)}
+    unknown_keys = set(project) - PROJECT_KEYS - config_fields
+    if unknown_keys:
+        raise ValueError(f"unknown project setting(s): {', '.join(sorted(unknown_keys))}")
+    graphic_url_mapper = None
+    if "base_url" in project:
+        graphic_url_mapper = partial(iiif_graphic_url, base_url=project["base_url"], project=project["name"])
+    extra_settings = {k: v for k, v in project.items() if k in config_fields}
+    return EditemApparatusConfig(**{
+        "project_name": project["name"],
+        "data_path": project["inputdir"],
+        "export_path": project["outputdir"],
+        "graphic_url_mapper": graphic_url_mapper,
+        "illustration_sizes_file": project.get("sizes"),
+        **extra_settings
+    })
+
+
+def menu_home_config(project: dict[str, Any]) -> EditemConfig:
+    return EditemConfig(
+        data_path=project["config_inputdir"],
+        export_path=project.get("config_outputdir", project["outputdir"]),
+        show_progress=project.get("show_progress", False),
+        gzip_level=project.get("gzip_level"),
+        validate=project.get("validate", True),
+        apparatus_path=project["inputdir"],
+        apparatus_export_path=project["outputdir"],
+    )
+
+
+def convert_apparatus(project: dict[str, Any]) -> list[str]:
+    return ApparatusConverter(apparatus_config(project)).convert()
+
+
+def convert_menu(project: dict[str, Any]) -> list[str]:
+    return MenuConverter(menu_home_config(project)).convert()
+
+
+def convert_home(project: dict[str, Any]) -> list[str]:
+    return HomeConverter(menu_home_config(project)).convert()
+
+
+def convert_projects(projects: list[dict[str, Any]], workers: Optional[int] = None) -> list[ProjectReport]:
+    reports = [ProjectReport(project.get("name", f"project {i + 1}")) for i, project in enumerate(projects)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        apparatus_futures = {}
+        for report, project in zip(reports, projects):
+            missing_keys = [k for k in ("name", "inputdir", "outputdir") if k not in project]
+            if missing_keys:
+                report.errors.append(f"missing project setting(s): {', '.join(missing_keys)}")
+                continue
+            apparatus_futures[executor.submit(convert_apparatus, project)] = (report, project)
+        config_futures = []
+        # the menu and home of a project are converted as soon as its apparatus is done, not after those of
+        # the projects before it in the list
+        for future in as_completed(apparatus_futures):
+            report, project = apparatus_futures[future]
+            _collect_errors(report, convert_apparatus.__name__, future)
+            if "config_inputdir" in project:
+                # the home page reads the result counts of its search links from the apparatus export
+                config_futures.extend((report, task.__name__, executor.submit(task, project))
+                                      for task in (convert_menu, convert_home))
+        for report, task_name, future in config_futures:
+            _collect_errors(report, task_name, future)
+    return reports
+
+
+def _collect_errors(report: ProjectReport, task_name: str, future: Future):
+    try:
+        report.errors.extend(future.result())
+    except Exception as e:
+        report.errors.append(f"{task_name} failed: {e}")
+
+
+def main():
+    batch_main()
+
+
+if __name__ == '__main__':
+    main()
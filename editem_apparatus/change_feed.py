@@ -0,0 +1,28 @@
+import hashlib
+from typing import Any
+
+import orjson
+
+
+def content_hash(entity: dict[str, Any]) -> str:
+    return hashlib.sha256(orjson.dumps(entity, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+def compute_changes(previous_hashes: dict[str, dict[str, str]],
+                    current_hashes: dict[str, dict[str, str]]) -> dict[str, dict[str, list[str]]]:
+    """
+    Compare the entity content hashes (by file base name, then by entity id) of two runs,
+    and return the added, modified and removed entity ids of every file with changes.
+    """
+    changes = {}
+    for base_name in sorted(set(previous_hashes) | set(current_hashes)):
+        previous = previous_hashes.get(base_name, {})
+        current = current_hashes.get(base_name, {})
+        file_changes = {
+            "added": sorted(i for i in current if i not in previous),
+            "modified": sorted(i for i in current if i in previous and current[i] != previous[i]),
+            "removed": sorted(i for i in previous if i not in current)
+        }
+        if any(file_changes.values()):
+            changes[base_name] = file_changes
+    return changes
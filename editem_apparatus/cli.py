@@ -0,0 +1,274 @@
+"""
+Command line entry points of the converters.
+
+The arguments are parsed before the converters are imported, so `--help` and argument errors are fast,
+and a conversion only loads the modules it needs.
+"""
+import os
+import sys
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter, Namespace
+from typing import Optional
+
+
+def _log_warnings_to_stderr():
+    # the cli owns the global logging configuration: the converters only add sinks for their own records
+    from loguru import logger
+
+    logger.remove()
+    logger.add(sink=sys.stderr, level="WARNING")
+
+
+def apparatus_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Extract structured data from editem apparatus tei xml",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-p', '--project', help="Project name", type=str, required=True)
+    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
+    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
+    parser.add_argument('-b', '--base-url', help="URL for the IIIF image server (scheme + server + prefix)", type=str,
+                        required=True)
+    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
+    parser.add_argument('--event-log', help="Event log (output): json lines with the counters and timing of every "
+                                            "converted file, and the aggregated warnings", type=str, default=None)
+    parser.add_argument('-s', '--sizes', help="Illustration sizes file", type=str)
+    parser.add_argument('-z', '--gzip-level', help="Also write .gz sidecars with this compression level (1-9)",
+                        type=int, choices=range(1, 10), default=None)
+    parser.add_argument('--search-index', help="Also write a prebuilt search index per entities file",
+                        action='store_true')
+    parser.add_argument('--page-size', help="Also write the entities in pages of this size, with a manifest",
+                        type=int, default=None)
+    parser.add_argument('--html-fragments', help="Also write the html of every listBibl/bibl separately, with a toc",
+                        action='store_true')
+    parser.add_argument('--change-feed', help="Also write the added/modified/removed entity ids since the last run",
+                        action='store_true')
+    parser.add_argument('--xml-backend', help="Xml parser backend; auto uses lxml when it is installed",
+                        choices=["auto", "lxml", "stdlib"], default="auto")
+    parser.add_argument('--skip-validation', help="Skip the validation of the xml files before converting",
+                        action='store_true')
+    parser.add_argument('--language-variants', help="Also write the entities and entity-dict files per language, "
+                                                    "with only the values in that language",
+                        nargs='+', metavar="LANG", default=None)
+    parser.add_argument('--pipeline', help="Convert the files in a pipeline of concurrent stages "
+                                           "(read, parse, transform, render, write)", action='store_true')
+    parser.add_argument('--pipeline-workers', help="Number of workers for a pipeline stage, like parse=2",
+                        nargs='+', metavar="STAGE=N", default=None)
+    parser.add_argument('--pipeline-queue-size', help="Maximum number of files waiting for each pipeline stage",
+                        type=int, default=4)
+    parser.add_argument('--entity-workers', help="Number of worker processes to parse the entities of large lists "
+                                                 "with", type=int, default=1)
+    parser.add_argument('--entity-chunk-size', help="Number of entities per worker task; smaller lists are parsed "
+                                                    "in the main process", type=int, default=1000)
+    parser.add_argument('--thumbnail-widths', help="Also add the iiif sizes, urls and aspect ratio of thumbnails"
+                                                   " of these widths to the graphics",
+                        type=int, nargs='+', metavar="WIDTH", default=None)
+    parser.add_argument('--relation-graph', help="Also write the relations between the entities as a graph in "
+                                                 "compact (CSR) form, to relation-graph.json", action='store_true')
+    parser.add_argument('--collation-keys', help="Also add a collation key to every entity, and write the sorted "
+                                                 "order of every entities file", action='store_true')
+    parser.add_argument('--name-link-policy', help="Sort persons by surname, ignoring the name link (ignore), "
+                                                   "or by name link and surname (include)",
+                        choices=["ignore", "include"], default="ignore")
+    parser.add_argument('--tables', help="Also write flat tables of the persons, bibls, objects and relations",
+                        choices=["tsv", "csv"], default=None)
+    parser.add_argument('--archive', help="Write the outputs into this .zip/.tar/.tar.gz/.tar.bz2/.tar.xz archive "
+                                          "(with paths relative to the output directory) instead of to disk",
+                        type=str, default=None)
+    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
+    return parser
+
+
+def apparatus_main(argv: Optional[list[str]] = None):
+    args = apparatus_parser().parse_args(argv)
+    from functools import partial
+
+    from editem_apparatus.apparatus_converter import ApparatusConverter, iiif_graphic_url
+    from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+    from editem_apparatus.pipeline import parse_stage_workers
+
+    _log_warnings_to_stderr()
+
+    config = EditemApparatusConfig(
+        project_name=args.project,
+        data_path=args.inputdir,
+        export_path=args.outputdir,
+        show_progress=False,
+        graphic_url_mapper=partial(iiif_graphic_url, base_url=args.base_url, project=args.project),
+        log_file_path=args.logfile,
+        illustration_sizes_file=args.sizes,
+        gzip_level=args.gzip_level,
+        validate=not args.skip_validation,
+        search_index=args.search_index,
+        page_size=args.page_size,
+        html_fragments=args.html_fragments,
+        change_feed=args.change_feed,
+        xml_backend=args.xml_backend,
+        archive_path=args.archive,
+        language_variants=args.language_variants,
+        pipeline=args.pipeline,
+        pipeline_workers=parse_stage_workers(args.pipeline_workers),
+        pipeline_queue_size=args.pipeline_queue_size,
+        entity_workers=args.entity_workers,
+        entity_chunk_size=args.entity_chunk_size,
+        event_log_path=args.event_log,
+        relation_graph=args.relation_graph,
+        table_format=args.tables,
+        thumbnail_widths=args.thumbnail_widths,
+        collation_keys=args.collation_keys,
+        name_link_policy=args.name_link_policy,
+    )
+
+    converter = ApparatusConverter(config)
+    # the errors are logged while the log of the converter is open, so they also end up in its log file
+    with converter.log:
+        errors = converter.convert()
+        for error in errors:
+            converter.log.error(error)
+    if converter.pipeline_stats:
+        print("pipeline stages:")
+        for s in converter.pipeline_stats:
+            print(f"- {s['stage']}: {s['processed']} file(s) in {s['busySeconds']}s with {s['workers']} worker(s),"
+                  f" max queue depth {s['maxQueueDepth']}")
+    if errors:
+        if args.ignore_errors:
+            sys.exit(0)
+        else:
+            sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def menu_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Convert editem menu config to json",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
+    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
+    parser.add_argument('-a', '--apparatusdir', help="Apparatus (data) Directory, to check the menu targets",
+                        type=str, default=None)
+    parser.add_argument('-e', '--apparatus-exportdir', help="Apparatus export Directory, to write a prefetch "
+                                                            "manifest of the files of the menu targets",
+                        type=str, default=None)
+    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
+    parser.add_argument('-z', '--gzip-level', help="Also write .gz sidecars with this compression level (1-9)",
+                        type=int, choices=range(1, 10), default=None)
+    parser.add_argument('--skip-validation', help="Skip the validation of the xml files before converting",
+                        action='store_true')
+    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
+    return parser
+
+
+def menu_main(argv: Optional[list[str]] = None):
+    args = menu_parser().parse_args(argv)
+    from editem_apparatus.configs import EditemConfig
+    from editem_apparatus.menu_converter import MenuConverter
+
+    _log_warnings_to_stderr()
+
+    config = EditemConfig(
+        data_path=args.inputdir,
+        export_path=args.outputdir,
+        show_progress=False,
+        log_file_path=args.logfile,
+        gzip_level=args.gzip_level,
+        validate=not args.skip_validation,
+        apparatus_path=args.apparatusdir,
+        apparatus_export_path=args.apparatus_exportdir,
+    )
+
+    converter = MenuConverter(config)
+    with converter.log:
+        errors = converter.convert()
+        for error in errors:
+            converter.log.error(error)
+    if errors:
+        if args.ignore_errors:
+            sys.exit(0)
+        else:
+            sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def home_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Convert editem home config to html",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
+    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
+    parser.add_argument('-e', '--apparatus-exportdir', help="Apparatus export Directory, to add the result "
+                                                            "counts to the ed:search links", type=str, default=None)
+    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
+    parser.add_argument('-z', '--gzip-level', help="Also write .gz sidecars with this compression level (1-9)",
+                        type=int, choices=range(1, 10), default=None)
+    parser.add_argument('--skip-validation', help="Skip the validation of the xml files before converting",
+                        action='store_true')
+    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
+    return parser
+
+
+def home_main(argv: Optional[list[str]] = None):
+    args = home_parser().parse_args(argv)
+    from loguru import logger
+
+    logger.catch(_convert_home)(args)
+
+
+def _convert_home(args: Namespace):
+    from editem_apparatus.configs import EditemConfig
+    from editem_apparatus.home_converter import HomeConverter
+
+    _log_warnings_to_stderr()
+
+    config = EditemConfig(
+        data_path=args.inputdir,
+        export_path=args.outputdir,
+        show_progress=False,
+        log_file_path=args.logfile,
+        gzip_level=args.gzip_level,
+        validate=not args.skip_validation,
+        apparatus_export_path=args.apparatus_exportdir,
+    )
+
+    converter = HomeConverter(config)
+    with converter.log:
+        errors = converter.convert()
+        for error in errors:
+            converter.log.error(error)
+    if errors:
+        if args.ignore_errors:
+            sys.exit(0)
+        else:
+            sys.exit(1)
+    else:
+        sys.exit(0)
+
+
+def batch_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        description="Convert the editem apparatus of all projects listed in a toml file",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('config', help="Batch configuration (toml)", type=str)
+    parser.add_argument('-w', '--workers', help="Number of worker processes (default: from config, or cpu count)",
+                        type=int, default=None)
+    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
+    return parser
+
+
+def batch_main(argv: Optional[list[str]] = None):
+    args = batch_parser().parse_args(argv)
+    from editem_apparatus.batch_converter import convert_projects, load_projects
+
+    _log_warnings_to_stderr()
+
+    projects, workers = load_projects(args.config)
+    reports = convert_projects(projects, args.workers or workers or os.cpu_count())
+    has_errors = False
+    for report in reports:
+        if report.errors:
+            has_errors = True
+            print(f"{report.name}: {len(report.errors)} error(s)")
+            for error in report.errors:
+                print(f"- {error}")
+        else:
+            print(f"{report.name}: ok")
+    sys.exit(1 if has_errors and not args.ignore_errors else 0)
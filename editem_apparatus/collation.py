@@ -0,0 +1,33 @@
+"""
+Collation keys: strings that sort entities in the expected order with a plain (code point) comparison,
+so clients don't need locale-aware sorting.
+"""
+import re
+import unicodedata
+
+NAME_LINK_POLICIES = ["ignore", "include"]
+
+non_word_pattern = re.compile(r"[^\w\s]+")
+space_pattern = re.compile(r"\s+")
+
+
+def fold(text: str) -> str:
+    """Casefold, remove diacritics and punctuation, and normalize the whitespace, so `Ëlsberg` sorts as `elsberg`."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return space_pattern.sub(" ", non_word_pattern.sub("", stripped)).strip()
+
+
+def person_collation_key(forename: str, name_link: str, surname: str, add_name: str, gen_name: str,
+                         full_name: str, name_link_policy: str = "ignore") -> str:
+    """
+    Sort persons by surname, then the other name parts, then forename.
+    With the `ignore` policy (the Dutch convention), `Vincent van Gogh` sorts under G, with the name link
+    as the last tie-breaker; with `include`, the name link is part of the surname, and he sorts under V.
+    """
+    if name_link_policy == "include":
+        parts = [f"{name_link} {surname}", add_name, gen_name, forename]
+    else:
+        parts = [surname, add_name, gen_name, forename, name_link]
+    key = " ".join(folded for folded in (fold(p) for p in parts) if folded)
+    return key or fold(full_name)
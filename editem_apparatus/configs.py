@@ -9,3 +9,7 @@ class EditemConfig:
     show_progress: bool = False
     log_file_path: Optional[str] = None
     file_url_prefix: str = ""
+    gzip_level: Optional[int] = None
+    apparatus_path: Optional[str] = None
+    apparatus_export_path: Optional[str] = None
+    validate: bool = True
@@ -0,0 +1,119 @@
+"""
+Logging scoped to one converter instance.
+
+Every record of a converter is bound to its `conversion_id`, and the log file (and the progress output)
+of a converter is a sink that only accepts those records, added when a conversion starts and removed when it ends.
+The converters leave the global logging configuration (like the default loguru handler) to the application,
+so several converters can run at the same time, in threads or in a long-lived process, each with its own log file.
+
+Messages are formatted lazily: the values for the `{}` placeholders are given as functions, which are only called
+when a sink takes records of that level, so disabled levels cost (almost) nothing.
+Besides the log, a converter can write structured events (like the counters and timing of every converted file)
+as json lines to an event log.
+"""
+import itertools
+import os
+import sys
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import orjson
+from loguru import logger
+
+WARNING_LEVEL = 30
+MAX_AGGREGATED_ITEMS_SHOWN = 10
+
+_conversion_ids = itertools.count(1)
+
+
+class ConversionLog:
+    def __init__(self, show_progress: bool = False, log_file_path: Optional[str] = None,
+                 event_log_path: Optional[str] = None):
+        self.conversion_id = next(_conversion_ids)
+        self.logger = logger.bind(conversion_id=self.conversion_id)
+        self.show_progress = show_progress
+        self.log_file_path = log_file_path
+        self.event_log_path = event_log_path
+        self.sink_ids: list[int] = []
+        self.depth = 0
+        self.event_file = None
+        self.aggregated_warnings: dict[str, list[str]] = {}
+        self.lock = threading.Lock()
+        # guards depth and the sinks; close() itself takes self.lock
+        self.sink_lock = threading.Lock()
+
+    def __enter__(self) -> "ConversionLog":
+        # nested uses share the sinks of the outermost one, so a caller can keep logging to them after a conversion
+        with self.sink_lock:
+            if self.depth == 0:
+                self.open()
+            self.depth += 1
+        return self
+
+    def __exit__(self, *exc_info):
+        with self.sink_lock:
+            self.depth -= 1
+            if self.depth == 0:
+                self.close()
+
+    def open(self):
+        """Start writing the records of this converter to its log file, and (for show_progress) to stderr."""
+        if self.log_file_path:
+            if os.path.exists(self.log_file_path):
+                os.remove(self.log_file_path)
+            self.sink_ids.append(logger.add(self.log_file_path, filter=self._is_own_record))
+        if self.show_progress:
+            # warnings and errors go to stderr through the handlers of the application, like the cli
+            self.sink_ids.append(logger.add(sys.stderr, level="INFO", filter=self._is_own_progress_record))
+        if self.event_log_path:
+            self.event_file = open(self.event_log_path, 'wb')
+
+    def close(self):
+        self._log_aggregated_warnings()
+        for sink_id in self.sink_ids:
+            logger.remove(sink_id)
+        self.sink_ids = []
+        if self.event_file is not None:
+            self.event_file.close()
+            self.event_file = None
+
+    def info(self, message: str, *args: Callable[[], Any]):
+        self.logger.opt(depth=1, lazy=True).info(message, *args)
+
+    def warning(self, message: str, *args: Callable[[], Any]):
+        self.logger.opt(depth=1, lazy=True).warning(message, *args)
+
+    def error(self, message: str, *args: Callable[[], Any]):
+        self.logger.opt(depth=1, lazy=True).error(message, *args)
+
+    def aggregate_warning(self, message: str, item: str):
+        """Collect a warning that can occur for many items; it is logged once, for all items, on `close()`."""
+        with self.lock:
+            self.aggregated_warnings.setdefault(message, []).append(item)
+
+    def event(self, event: str, **fields: Any):
+        """Write an event, with the given fields, to the event log (if there is one)."""
+        if self.event_file is None:
+            return
+        line = orjson.dumps({"event": event, "conversionId": self.conversion_id, "time": round(time.time(), 6),
+                             **fields})
+        with self.lock:
+            self.event_file.write(line + b"\n")
+
+    def _log_aggregated_warnings(self):
+        with self.lock:
+            aggregated_warnings = self.aggregated_warnings
+            self.aggregated_warnings = {}
+        for message, items in aggregated_warnings.items():
+            shown = ", ".join(items[:MAX_AGGREGATED_ITEMS_SHOWN])
+            hidden = len(items) - MAX_AGGREGATED_ITEMS_SHOWN
+            more = f" and {hidden} more" if hidden > 0 else ""
+            self.logger.warning(f"{message} ({len(items)}x): {shown}{more}")
+            self.event("aggregatedWarning", message=message, count=len(items), items=items)
+
+    def _is_own_record(self, record: dict[str, Any]) -> bool:
+        return record["extra"].get("conversion_id") == self.conversion_id
+
+    def _is_own_progress_record(self, record: dict[str, Any]) -> bool:
+        return self._is_own_record(record) and record["level"].no < WARNING_LEVEL
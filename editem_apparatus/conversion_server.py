@@ -0,0 +1,157 @@
+import hashlib
+import sys
+import threading
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import OrderedDict
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+import orjson
+from loguru import logger
+
+from editem_apparatus.apparatus_converter import ApparatusConverter, iiif_graphic_url
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.home_converter import HomeConverter
+from editem_apparatus.in_memory import in_memory_converter
+from editem_apparatus.menu_converter import MenuConverter
+
+
+class ConversionService:
+    """
+    Keeps one warm converter per kind (apparatus, menu, home) and caches the converted outputs
+    in a bounded LRU cache, keyed by the hash of the kind, base name, config and xml content.
+    """
+
+    def __init__(self, apparatus_config: EditemApparatusConfig, config: EditemConfig, cache_size: int = 128):
+        self.converters = {
+            "apparatus": in_memory_converter(ApparatusConverter, apparatus_config),
+            "menu": in_memory_converter(MenuConverter, config),
+            "home": in_memory_converter(HomeConverter, config),
+        }
+        self.config_fingerprint = f"{apparatus_config!r}|{config!r}".encode('utf-8')
+        self.cache_size = cache_size
+        self.cache: OrderedDict[str, bytes] = OrderedDict()
+        self.cache_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def convert(self, kind: str, xml: bytes, base_name: str) -> tuple[bytes, bool]:
+        """Returns the json-serialized outputs and errors, and whether they came from the cache."""
+        key = self._cache_key(kind, xml, base_name)
+        with self.cache_lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                return self.cache[key], True
+            self.misses += 1
+        files, errors = self.converters[kind].convert_source(xml, base_name)
+        response = orjson.dumps({"files": files, "errors": errors})
+        with self.cache_lock:
+            self.cache[key] = response
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return response, False
+
+    def status(self) -> dict[str, Any]:
+        with self.cache_lock:
+            return {"cached": len(self.cache), "cacheSize": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+    def _cache_key(self, kind: str, xml: bytes, base_name: str) -> str:
+        digest = hashlib.sha256()
+        for part in (kind.encode('utf-8'), base_name.encode('utf-8'), self.config_fingerprint, xml):
+            digest.update(len(part).to_bytes(8, 'big'))
+            digest.update(part)
+        return digest.hexdigest()
+
+
+class ConversionRequestHandler(BaseHTTPRequestHandler):
+    """
+    POST /{apparatus|menu|home}?name={base name} with the xml as body returns {"files": {...}, "errors": [...]};
+    GET /status returns the cache statistics.
+    """
+    service: ConversionService
+
+    def do_GET(self):
+        if urlparse(self.path).path == "/status":
+            self._respond(HTTPStatus.OK, orjson.dumps(self.service.status()))
+        else:
+            self._respond_error(HTTPStatus.NOT_FOUND, f"unknown path: {self.path}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        kind = url.path.strip("/")
+        if kind not in self.service.converters:
+            self._respond_error(HTTPStatus.NOT_FOUND, f"unknown conversion: {kind}")
+            return
+        base_name = parse_qs(url.query).get("name", [kind])[0]
+        xml = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            response, cached = self.service.convert(kind, xml, base_name)
+        except Exception as e:
+            self._respond_error(HTTPStatus.UNPROCESSABLE_ENTITY, f"there was an error converting {base_name}: {e}")
+            return
+        self._respond(HTTPStatus.OK, response, {"X-Cache": "hit" if cached else "miss"})
+
+    def _respond_error(self, status: HTTPStatus, message: str):
+        self._respond(status, orjson.dumps({"files": {}, "errors": [message]}))
+
+    def _respond(self, status: HTTPStatus, body: bytes, headers: Optional[dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+
+def create_server(service: ConversionService, host: str = "127.0.0.1", port: int = 8041) -> ThreadingHTTPServer:
+    handler_class = type("BoundConversionRequestHandler", (ConversionRequestHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler_class)
+
+
+def main():
+    parser = ArgumentParser(
+        description="Serve editem apparatus, menu and home conversions on localhost",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-p', '--project', help="Project name", type=str, required=True)
+    parser.add_argument('-b', '--base-url', help="URL for the IIIF image server (scheme + server + prefix)", type=str,
+                        required=True)
+    parser.add_argument('-s', '--sizes', help="Illustration sizes file", type=str)
+    parser.add_argument('--host', help="Host to bind to", type=str, default="127.0.0.1")
+    parser.add_argument('--port', help="Port to listen on", type=int, default=8041)
+    parser.add_argument('--cache-size', help="Maximum number of cached conversions", type=int, default=128)
+    args = parser.parse_args()
+
+    logger.remove()
+    logger.add(sink=sys.stderr, level="INFO")
+
+    apparatus_config = EditemApparatusConfig(
+        project_name=args.project,
+        data_path=".",
+        export_path=".",
+        graphic_url_mapper=partial(iiif_graphic_url, base_url=args.base_url, project=args.project),
+        illustration_sizes_file=args.sizes,
+    )
+    config = EditemConfig(data_path=".", export_path=".")
+    service = ConversionService(apparatus_config, config, cache_size=args.cache_size)
+    server = create_server(service, args.host, args.port)
+    logger.info(f"serving conversions for {args.project} on http://{args.host}:{server.server_port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
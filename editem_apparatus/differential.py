@@ -0,0 +1,137 @@
+"""
+Differential testing of the optional conversion modes against the reference (serial, stdlib) conversion:
+the same apparatus is converted in every mode, and every output file is compared structurally with the
+reference output, so a fast path can only be made the default when it gives exactly the same results.
+"""
+import contextlib
+import io
+import os
+import tempfile
+import time
+from dataclasses import dataclass, field, replace
+from typing import Any, Optional
+
+import orjson
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+
+REFERENCE_MODE = {"xml_backend": "stdlib", "pipeline": False}
+MODES: dict[str, dict[str, Any]] = {
+    "lxml": {"xml_backend": "lxml"},
+    "pipeline": {"pipeline": True, "pipeline_workers": {"parse": 2, "render": 2}},
+    "entity-workers": {"entity_workers": 2, "entity_chunk_size": 8},
+}
+
+
+@dataclass
+class ModeRun:
+    mode: str
+    seconds: float
+    errors: list[str]
+    files: dict[str, bytes]
+
+
+@dataclass
+class ModeComparison:
+    mode: str
+    seconds: float
+    reference_seconds: float
+    differences: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def is_identical(self) -> bool:
+        return not self.differences
+
+    @property
+    def speedup(self) -> float:
+        return self.reference_seconds / self.seconds if self.seconds else 0.0
+
+
+def run_mode(config: EditemApparatusConfig, mode: str, overrides: dict[str, Any]) -> ModeRun:
+    """Convert the apparatus with the config changed by `overrides`, into a fresh export directory."""
+    with tempfile.TemporaryDirectory() as export_path:
+        converter = ApparatusConverter(replace(config, export_path=export_path, **overrides))
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            errors = converter.convert()
+        seconds = time.perf_counter() - start
+        files = {}
+        for directory, _, file_names in os.walk(export_path):
+            for file_name in file_names:
+                path = os.path.join(directory, file_name)
+                with open(path, 'rb') as f:
+                    files[os.path.relpath(path, export_path)] = f.read()
+    return ModeRun(mode, seconds, errors, files)
+
+
+def compare_modes(config: EditemApparatusConfig, modes: Optional[list[str]] = None) -> list[ModeComparison]:
+    """Convert in the reference mode and in each of the `modes` (default: all), and compare the results."""
+    reference = run_mode(config, "reference", REFERENCE_MODE)
+    comparisons = []
+    for mode in modes or list(MODES):
+        if mode not in MODES:
+            raise ValueError(f"unknown mode: {mode}, expected one of {', '.join(MODES)}")
+        run = run_mode(config, mode, REFERENCE_MODE | MODES[mode])
+        comparisons.append(ModeComparison(mode, run.seconds, reference.seconds, compare_runs(reference, run)))
+    return comparisons
+
+
+def compare_runs(reference: ModeRun, run: ModeRun) -> dict[str, str]:
+    """Return the first difference per output file, for the files that differ."""
+    differences = {}
+    if reference.errors != run.errors:
+        differences["(errors)"] = first_difference(reference.errors, run.errors)
+    for file_name in sorted(set(reference.files) | set(run.files)):
+        if file_name not in run.files:
+            differences[file_name] = "missing"
+        elif file_name not in reference.files:
+            differences[file_name] = "not in the reference output"
+        elif reference.files[file_name] != run.files[file_name]:
+            differences[file_name] = file_difference(file_name, reference.files[file_name], run.files[file_name])
+    return differences
+
+
+def file_difference(file_name: str, expected: bytes, actual: bytes) -> str:
+    if file_name.endswith(".json"):
+        difference = first_difference(orjson.loads(expected), orjson.loads(actual))
+        return difference or "same data, different serialization (key order or formatting)"
+    expected_lines = expected.decode('utf-8').splitlines()
+    actual_lines = actual.decode('utf-8').splitlines()
+    for line_number, (expected_line, actual_line) in enumerate(zip(expected_lines, actual_lines), start=1):
+        if expected_line != actual_line:
+            return f"line {line_number}: expected {expected_line!r}, got {actual_line!r}"
+    if len(expected_lines) != len(actual_lines):
+        return f"expected {len(expected_lines)} lines, got {len(actual_lines)}"
+    return "different line endings or encoding"
+
+
+def first_difference(expected: Any, actual: Any, path: str = "$") -> Optional[str]:
+    """Return a description of the first difference between two json values (key order is ignored), or None."""
+    if type(expected) is not type(actual):
+        return f"{path}: expected {_short(expected)}, got {_short(actual)}"
+    if isinstance(expected, dict):
+        for key in expected:
+            if key not in actual:
+                return f"{path}.{key}: missing"
+            difference = first_difference(expected[key], actual[key], f"{path}.{key}")
+            if difference:
+                return difference
+        extra_keys = [key for key in actual if key not in expected]
+        return f"{path}.{extra_keys[0]}: not in the reference output" if extra_keys else None
+    if isinstance(expected, list):
+        for i, (expected_item, actual_item) in enumerate(zip(expected, actual)):
+            difference = first_difference(expected_item, actual_item, f"{path}[{i}]")
+            if difference:
+                return difference
+        if len(expected) != len(actual):
+            return f"{path}: expected {len(expected)} items, got {len(actual)}"
+        return None
+    if expected != actual:
+        return f"{path}: expected {_short(expected)}, got {_short(actual)}"
+    return None
+
+
+def _short(value: Any, max_length: int = 80) -> str:
+    text = orjson.dumps(value).decode('utf-8')
+    return text if len(text) <= max_length else f"{text[:max_length - 3]}..."
@@ -1,7 +1,5 @@
 from dataclasses import dataclass
-from typing import Optional
-
-from typing_extensions import Callable
+from typing import Callable, Optional
 
 
 @dataclass
@@ -14,3 +12,23 @@ class EditemApparatusConfig:
     graphic_url_mapper: Optional[Callable[[str], str]] = None
     file_url_prefix: str = ""
     illustration_sizes_file: Optional[str] = None
+    gzip_level: Optional[int] = None
+    search_index: bool = False
+    page_size: Optional[int] = None
+    html_fragments: bool = False
+    validate: bool = True
+    change_feed: bool = False
+    xml_backend: str = "auto"
+    archive_path: Optional[str] = None
+    language_variants: Optional[list[str]] = None
+    pipeline: bool = False
+    pipeline_workers: Optional[dict[str, int]] = None
+    pipeline_queue_size: int = 4
+    table_format: Optional[str] = None
+    thumbnail_widths: Optional[list[int]] = None
+    collation_keys: bool = False
+    name_link_policy: str = "ignore"
+    entity_workers: int = 1
+    entity_chunk_size: int = 1000
+    event_log_path: Optional[str] = None
+    relation_graph: bool = False
@@ -1,17 +1,26 @@
+import copy
 import os
+import re
 import sys
 import traceback
 import xml.sax
-from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from collections import Counter
+from typing import Any, Optional, Union
 
-from loguru import logger
+import orjson
 
+from editem_apparatus.cli import home_main
 from editem_apparatus.configs import EditemConfig
+from editem_apparatus.conversion_log import ConversionLog
 from editem_apparatus.home_handler import HomeHandler
-from editem_apparatus.io_tools import IOHandler
+from editem_apparatus.io_tools import IOHandler, MemoryIOHandler
+from editem_apparatus.validation import HOME_CAPTURE_ELEMENTS, HOME_REQUIRED_ATTRIBUTES, validate_files
 
 ns = {'xml': 'http://www.w3.org/XML/1998/namespace'}
 
+# the entities file per apparatus file, like bio-entities.json (not the split, paged or language variants)
+ENTITIES_FILE_PATTERN = re.compile(r"^([^.]+)-entities\.json$")
+
 
 class HomeConverter:
     def __init__(self, config: EditemConfig):
@@ -19,75 +28,124 @@ class HomeConverter:
         self.output_directory = config.export_path.removesuffix("/")
         self.file_url_prefix = config.file_url_prefix
         self.errors = []
-        self.rw = IOHandler()
-        if not config.show_progress:
-            logger.remove()
-            logger.add(sys.stderr, level="WARNING")
-        if config.log_file_path:
-            logger.remove()
-            if os.path.exists(config.log_file_path):
-                os.remove(config.log_file_path)
-            logger.add(config.log_file_path)
+        self.log = ConversionLog(config.show_progress, config.log_file_path)
+        self.rw = IOHandler(gzip_level=config.gzip_level, log=self.log)
+        self.validate = config.validate
+        self.apparatus_export_path = config.apparatus_export_path
+        self.search_counts: Optional[dict[str, int]] = None
+        # the (name, mtime, size) of the entities files the search counts were loaded from
+        self.search_counts_signature: Optional[tuple[tuple[str, int, int], ...]] = None
 
     def convert(self) -> list[str]:
-        base_dir = self.apparatus_directory
-        xml_files = [filename for filename in os.listdir(base_dir) if filename.endswith("home.xml")]
-        for xml_file in xml_files:
-            try:
-                base_name = xml_file.removesuffix(".xml")
-                export_dir = f"{self.output_directory}"
-                os.makedirs(export_dir, exist_ok=True)
-                self._process_xml(f"{base_dir}/{xml_file}", export_dir, base_name)
-            except Exception as e:
-                message = f"there was an error converting {xml_file}: {e}"
-                self.errors.append(message)
-                print(traceback.format_exc(), file=sys.stderr)
-        self.rw.report_generated_files()
-        return self.errors
+        with self.log:
+            base_dir = self.apparatus_directory
+            xml_files = [filename for filename in os.listdir(base_dir) if filename.endswith("home.xml")]
+            if self.validate and not self._is_valid([f"{base_dir}/{xml_file}" for xml_file in xml_files]):
+                return self.errors
+            for xml_file in xml_files:
+                try:
+                    base_name = xml_file.removesuffix(".xml")
+                    export_dir = f"{self.output_directory}"
+                    os.makedirs(export_dir, exist_ok=True)
+                    self._process_xml(f"{base_dir}/{xml_file}", export_dir, base_name)
+                except Exception as e:
+                    message = f"there was an error converting {xml_file}: {e}"
+                    self.errors.append(message)
+                    print(traceback.format_exc(), file=sys.stderr)
+            self.rw.report_generated_files()
+            return self.errors
+
+    def _is_valid(self, xml_paths: list[str]) -> bool:
+        problems = validate_files(xml_paths, HOME_REQUIRED_ATTRIBUTES, HOME_CAPTURE_ELEMENTS)
+        for problem in problems:
+            self.log.error(problem)
+        self.errors.extend(problems)
+        return not problems
+
+    def convert_source(self, xml_source: Union[str, bytes], base_name: str) -> tuple[dict[str, Any], list[str]]:
+        """
+        Convert a single home xml document in memory, without touching the filesystem.
+        Returns the generated outputs by file name, and the errors.
+        """
+        converter = copy.copy(self)
+        converter.rw = MemoryIOHandler(self.output_directory)
+        converter.errors = []
+        converter._convert_to_html(xml_source, self.output_directory, base_name)
+        return converter.rw.files, converter.errors
 
     def _process_xml(self, xml_path: str, output_dir: str, base_name: str):
         xml_source = self.rw.read_text(xml_path)
         self._convert_to_html(xml_source, output_dir, base_name)
 
-    def _convert_to_html(self, xml_source: str, output_dir, base_name):
-        handler = HomeHandler()
+    def _convert_to_html(self, xml_source: Union[str, bytes], output_dir, base_name):
+        handler = HomeHandler(log=self.log, search_counts=self._search_counts())
         xml.sax.parseString(xml_source, handler)
+        if handler.unresolved_targets:
+            error = (f"{base_name}.xml has {len(handler.unresolved_targets)} ed:search target(s) not found in "
+                     f"{self.apparatus_export_path}: {', '.join(handler.unresolved_targets)}")
+            self.log.error(error)
+            self.errors.append(error)
         path = f"{output_dir}/{base_name}.html"
         self.rw.write_text(path, handler.html_string.strip())
 
+    def _search_counts(self) -> Optional[dict[str, int]]:
+        # reloaded when the apparatus has been exported again since they were loaded
+        if not self.apparatus_export_path:
+            return None
+        signature = self._entities_files_signature(self.apparatus_export_path)
+        if self.search_counts is None or signature != self.search_counts_signature:
+            self.search_counts = self._load_search_counts(self.apparatus_export_path)
+            self.search_counts_signature = signature
+        return self.search_counts
+
+    @staticmethod
+    def _entities_files_signature(export_path: str) -> tuple[tuple[str, int, int], ...]:
+        file_names = sorted(os.listdir(export_path)) if os.path.isdir(export_path) else []
+        signature = []
+        for file_name in file_names:
+            if ENTITIES_FILE_PATTERN.match(file_name):
+                stat = os.stat(f"{export_path}/{file_name}")
+                signature.append((file_name, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _load_search_counts(self, export_path: str) -> dict[str, int]:
+        """
+        Count, for every entity in the apparatus export, the entities that have a relation to it.
+        The entities can be targeted as `file.xml#id`, or (when the id is unique in the project) as `#id` or `id`.
+        """
+        refs = []
+        related_entities: dict[str, set[str]] = {}
+        file_names = sorted(os.listdir(export_path)) if os.path.isdir(export_path) else []
+        for file_name in file_names:
+            match = ENTITIES_FILE_PATTERN.match(file_name)
+            if not match:
+                continue
+            xml_file = f"{match.group(1)}.xml"
+            # read from disk, also when converting in memory
+            with open(f"{export_path}/{file_name}", 'rb') as f:
+                entities = orjson.loads(f.read())
+            for entity in entities:
+                ref = f"{xml_file}#{entity['id']}"
+                refs.append(ref)
+                relations = entity.get("relation", [])
+                for relation in [relations] if isinstance(relations, dict) else relations:
+                    if "ref" in relation:
+                        # a ref to an entity in the same file (`#id`) gets the file of the source
+                        target = relation["ref"]
+                        if target.startswith("#"):
+                            target = f"{xml_file}{target}"
+                        related_entities.setdefault(target, set()).add(ref)
+        counts = {ref: len(related_entities.get(ref, ())) for ref in refs}
+        ids = [ref.split("#")[1] for ref in refs]
+        id_occurrences = Counter(ids)
+        for ref, entity_id in zip(refs, ids):
+            if id_occurrences[entity_id] == 1:
+                counts[entity_id] = counts[f"#{entity_id}"] = counts[ref]
+        return counts
+
 
-@logger.catch
 def main():
-    parser = ArgumentParser(
-        description="Convert editem home config to html",
-        formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
-    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
-    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
-    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
-    args = parser.parse_args()
-
-    if args.ignore_errors:
-        logger.remove()
-        logger.add(sink=sys.stderr, level="WARNING")
-
-    config = EditemConfig(
-        data_path=args.inputdir,
-        export_path=args.outputdir,
-        show_progress=False,
-        log_file_path=args.logfile,
-    )
-
-    errors = HomeConverter(config).convert()
-    if errors:
-        for error in errors:
-            logger.error(error)
-        if args.ignore_errors:
-            sys.exit(0)
-        else:
-            sys.exit(1)
-    else:
-        sys.exit(0)
+    home_main()
 
 
 if __name__ == '__main__':
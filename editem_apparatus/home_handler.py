@@ -1,9 +1,11 @@
 import html
 from collections import deque
+from typing import Optional
 from xml.sax import ContentHandler
 
 from loguru import logger
 
+from editem_apparatus.conversion_log import ConversionLog
 from editem_apparatus.utils import linkify_urls
 
 TARGET = "target"
@@ -11,7 +13,14 @@ FACET_ID = "facetID"
 
 
 class HomeHandler(ContentHandler):
-    def __init__(self):
+    def __init__(self, log: Optional[ConversionLog] = None, search_counts: Optional[dict[str, int]] = None):
+        """
+        With `search_counts` (the result count per `ed:search` target), the search links get a `data-count`
+        attribute; targets that are not in `search_counts` are collected in `unresolved_targets`.
+        """
+        self.log = log or logger
+        self.search_counts = search_counts
+        self.unresolved_targets = []
         self.html_string = ""
         self.capture = False
         self.parent_tag_stack = deque()
@@ -50,10 +59,16 @@ class HomeHandler(ContentHandler):
                 facet = f"{facetId}Id"
                 facet_value = target.split("#")[-1]
                 href = f"?query[terms][{facet}][]={facet_value}"
-                self.html_string += f'<a href="{href}">'
+                count_attribute = ""
+                if self.search_counts is not None:
+                    if target in self.search_counts:
+                        count_attribute = f' data-count="{self.search_counts[target]}"'
+                    else:
+                        self.unresolved_targets.append(target)
+                self.html_string += f'<a href="{href}"{count_attribute}>'
                 self.close_tags[name] = "</a>"
             else:
-                logger.warning(
+                self.log.warning(
                     f"{name} element should have both `{FACET_ID}` and `{TARGET}` attributes, attributes found: {attrs.keys()}")
 
         elif self.capture and name == "head":
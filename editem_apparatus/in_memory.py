@@ -0,0 +1,79 @@
+from dataclasses import dataclass, replace
+from typing import Any, Union
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.home_converter import HomeConverter
+from editem_apparatus.menu_converter import MenuConverter
+
+
+@dataclass
+class ApparatusConversion:
+    document: dict[str, Any]
+    entity_dict: dict[str, dict[str, Any]]
+    entities: dict[str, list[dict[str, Any]]]
+    html: str
+    files: dict[str, Any]
+    errors: list[str]
+
+
+@dataclass
+class MenuConversion:
+    menu: dict[str, Any]
+    files: dict[str, Any]
+    errors: list[str]
+
+
+@dataclass
+class HomeConversion:
+    html: str
+    files: dict[str, Any]
+    errors: list[str]
+
+
+def convert_apparatus_xml(xml: Union[str, bytes], config: EditemApparatusConfig,
+                          base_name: str = "apparatus") -> ApparatusConversion:
+    """
+    Convert one apparatus xml document without writing or deleting any files.
+    `entities` has the entity lists by name, as they would be exported to `{name}-entities.json`;
+    `files` has all generated outputs by file name.
+    """
+    return apparatus_conversion(in_memory_converter(ApparatusConverter, config), xml, base_name)
+
+
+def convert_menu_xml(xml: Union[str, bytes], config: EditemConfig, base_name: str = "menu") -> MenuConversion:
+    return menu_conversion(in_memory_converter(MenuConverter, config), xml, base_name)
+
+
+def convert_home_xml(xml: Union[str, bytes], config: EditemConfig, base_name: str = "home") -> HomeConversion:
+    return home_conversion(in_memory_converter(HomeConverter, config), xml, base_name)
+
+
+def in_memory_converter(converter_class: type, config: Union[EditemConfig, EditemApparatusConfig]):
+    # no log file, which would be deleted first
+    return converter_class(replace(config, log_file_path=None))
+
+
+def apparatus_conversion(converter: ApparatusConverter, xml: Union[str, bytes],
+                         base_name: str) -> ApparatusConversion:
+    files, errors = converter.convert_source(xml, base_name)
+    return ApparatusConversion(
+        document=files[f"{base_name}.json"],
+        entity_dict=files[f"{base_name}-entity-dict.json"],
+        entities={name.removesuffix("-entities.json"): data for name, data in files.items() if
+                  name.endswith("-entities.json")},
+        html=files[f"{base_name}.html"],
+        files=files,
+        errors=errors
+    )
+
+
+def menu_conversion(converter: MenuConverter, xml: Union[str, bytes], base_name: str) -> MenuConversion:
+    files, errors = converter.convert_source(xml, base_name)
+    return MenuConversion(menu=files[f"{base_name}.json"], files=files, errors=errors)
+
+
+def home_conversion(converter: HomeConverter, xml: Union[str, bytes], base_name: str) -> HomeConversion:
+    files, errors = converter.convert_source(xml, base_name)
+    return HomeConversion(html=files[f"{base_name}.html"], files=files, errors=errors)
@@ -1,25 +1,43 @@
 import csv
+import gzip
+import io
+import itertools
 import json
+import os
+import threading
 from json import JSONEncoder
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Optional
 
 import orjson
 from loguru import logger
 
+from editem_apparatus.conversion_log import ConversionLog
+
+TSV_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\r": "\\r", "\n": "\\n"})
+
+
+def _tsv_field(value: Any) -> str:
+    return "\\N" if value is None else str(value).translate(TSV_ESCAPES)
+
 
 class IOHandler:
 
-    def __init__(self, file_url_prefix: str = ""):
+    def __init__(self, file_url_prefix: str = "", gzip_level: Optional[int] = None,
+                 log: Optional[ConversionLog] = None):
         self.generated_file_urls = []
         self.file_url_prefix = file_url_prefix
+        self.gzip_level = gzip_level
+        # messages are formatted lazily, like in ConversionLog
+        self.log = log or logger.opt(lazy=True)
 
-    def write_text(self, path: str, text: str, quiet: bool = False) -> None:
+    def write_text(self, path: str, text: str, quiet: bool = False) -> int:
         if not quiet:
             self._log_writing_file(path)
-        with open(path, mode='w', newline='') as file:
-            file.write(text)
+        content = text.encode('utf-8')
+        self._write_bytes(path, content)
         self._add_generated_file(path)
+        return len(content)
 
     def read_text(self, path: str, quiet: bool = False) -> str:
         if not quiet:
@@ -29,12 +47,13 @@ class IOHandler:
         return text
 
     def write_json(self, path: str, data: Any, quiet: bool = False,
-                   encoder: type[JSONEncoder] = JSONEncoder) -> None:
+                   encoder: type[JSONEncoder] = JSONEncoder) -> int:
         if not quiet:
             self._log_writing_file(path)
-        with open(path, mode='w', newline='') as file:
-            json.dump(data, file, indent=4, ensure_ascii=False, cls=encoder)
+        content = json.dumps(data, indent=4, ensure_ascii=False, cls=encoder).encode('utf-8')
+        self._write_bytes(path, content)
         self._add_generated_file(path)
+        return len(content)
 
     def read_json(self, path: str, quiet: bool = False) -> Any:
         if not quiet:
@@ -43,34 +62,244 @@ class IOHandler:
             data = orjson.loads(f.read())
         return data
 
-    def write_tsv(self, path: str, headers: list[str], records: list[Any], quiet: bool = False) -> None:
+    def write_tsv(self, path: str, headers: list[str], records: Iterable[Any], quiet: bool = False) -> int:
+        """
+        Write the records in the text format of PostgreSQL `COPY`, with a header line: tab separated, with
+        backslash escapes for backslash, tab, carriage return and newline, and `\\N` for None.
+        """
         if not quiet:
             self._log_writing_file(path)
-        with open(path, mode='w', newline='') as file:
-            writer = csv.writer(file, delimiter='\t')
-            writer.writerow(headers)
-            writer.writerows(records)
+        lines = ("\t".join(_tsv_field(value) for value in record) + "\n"
+                 for record in itertools.chain([headers], records))
+        content = "".join(lines).encode('utf-8')
+        self._write_bytes(path, content)
+        self._add_generated_file(path)
+        return len(content)
 
-    def write_csv(self, path: str, headers: list[str], records: list[Any], quiet: bool = False) -> None:
+    def write_csv(self, path: str, headers: list[str], records: Iterable[Any], quiet: bool = False) -> int:
         if not quiet:
             self._log_writing_file(path)
-        with open(path, mode='w', newline='') as file:
-            writer = csv.writer(file)
-            writer.writerow(headers)
-            writer.writerows(records)
+        buffer = io.StringIO(newline='')
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        writer.writerows(records)
+        content = buffer.getvalue().encode('utf-8')
+        self._write_bytes(path, content)
+        self._add_generated_file(path)
+        return len(content)
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path)
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "IOHandler":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
     def report_generated_files(self) -> None:
         print("generated files:")
         for f in sorted(self.generated_file_urls):
             print(f"- {f}")
 
+    def _write_bytes(self, path: str, content: bytes) -> None:
+        # when gzip_level is set, a precompressed `{path}.gz` sidecar is written next to the file,
+        # but only when the uncompressed content differs from what is already on disk
+        gzip_path = f"{path}.gz"
+        compress = self.gzip_level is not None and not self._has_same_content(path, content, gzip_path)
+        with open(path, mode='wb') as file:
+            file.write(content)
+        if compress:
+            with open(gzip_path, mode='wb') as file:
+                file.write(gzip.compress(content, compresslevel=self.gzip_level, mtime=0))
+
+    @staticmethod
+    def _has_same_content(path: str, content: bytes, gzip_path: str) -> bool:
+        if not os.path.exists(gzip_path) or not os.path.exists(path) or os.path.getsize(path) != len(content):
+            return False
+        with open(path, mode='rb') as file:
+            return file.read() == content
+
     def _add_generated_file(self, path: str):
         self.generated_file_urls.append(f"{self.file_url_prefix}{path}")
 
-    @staticmethod
-    def _log_reading_file(path: str | Path, extra: str = "") -> None:
-        logger.info(f"<= {path}{extra}")
+    def _log_reading_file(self, path: str | Path, extra: str = "") -> None:
+        self.log.info("<= {}{}", lambda: path, lambda: extra)
 
-    @staticmethod
-    def _log_writing_file(path: str | Path, extra: str = "") -> None:
-        logger.info(f"=> {path}{extra}")
+    def _log_writing_file(self, path: str | Path, extra: str = "") -> None:
+        self.log.info("=> {}{}", lambda: path, lambda: extra)
+
+
+class MemoryIOHandler(IOHandler):
+    """
+    IOHandler that keeps everything that is written in `files`, keyed by the path relative to `root`,
+    instead of writing to disk. Json data is stored as a copy, as it would be read back from disk;
+    everything else (like html and tables) as text.
+    """
+
+    def __init__(self, root: str):
+        super().__init__()
+        self.root = root.removesuffix("/")
+        self.files: dict[str, Any] = {}
+
+    def write_text(self, path: str, text: str, quiet: bool = False) -> int:
+        self.files[self._relative_path(path)] = text
+        self._add_generated_file(path)
+        return len(text.encode('utf-8'))
+
+    def read_text(self, path: str, quiet: bool = False) -> str:
+        return self.files[self._relative_path(path)]
+
+    def write_json(self, path: str, data: Any, quiet: bool = False,
+                   encoder: type[JSONEncoder] = JSONEncoder) -> int:
+        content = json.dumps(data, indent=4, ensure_ascii=False, cls=encoder).encode('utf-8')
+        self.files[self._relative_path(path)] = orjson.loads(content)
+        self._add_generated_file(path)
+        return len(content)
+
+    def read_json(self, path: str, quiet: bool = False) -> Any:
+        return orjson.loads(orjson.dumps(self.files[self._relative_path(path)]))
+
+    def exists(self, path: str) -> bool:
+        return self._relative_path(path) in self.files
+
+    def _write_bytes(self, path: str, content: bytes) -> None:
+        self.files[self._relative_path(path)] = content.decode('utf-8')
+
+    def _relative_path(self, path: str) -> str:
+        return path.removeprefix(f"{self.root}/")
+
+
+class BufferedIOHandler(IOHandler):
+    """
+    IOHandler that keeps the encoded content of everything that is written,
+    until `flush()` writes it with another IOHandler.
+    """
+
+    def __init__(self, log: Optional[ConversionLog] = None):
+        super().__init__(log=log)
+        self.buffer: list[tuple[str, bytes]] = []
+
+    def flush(self, target: IOHandler) -> None:
+        for path, content in self.buffer:
+            target._write_bytes(path, content)
+            target._add_generated_file(path)
+        self.buffer = []
+
+    def _write_bytes(self, path: str, content: bytes) -> None:
+        self.buffer.append((path, content))
+
+    def _add_generated_file(self, path: str):
+        pass
+
+
+ARCHIVE_TAR_MODES = {".tar": "w|", ".tar.gz": "w|gz", ".tgz": "w|gz", ".tar.bz2": "w|bz2", ".tar.xz": "w|xz"}
+ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
+
+class ArchiveIOHandler(IOHandler):
+    """
+    IOHandler that streams everything that is written into a zip or (optionally compressed) tar archive,
+    as entries with the path relative to `root`, instead of writing to disk.
+    The archive type follows from the extension of `archive_path`: .zip, .tar, .tar.gz/.tgz, .tar.bz2 or .tar.xz.
+    The archive is written to `{archive_path}.part` from the first write on, and replaces `archive_path` on
+    `close()`. Until then, the outputs of the previous run (the paths under `root`, like the entity hashes
+    of the change feed) are read from the previous archive; other files, like the xml sources, from disk.
+    Entries get a fixed timestamp, so converting the same data gives the same archive.
+    """
+
+    def __init__(self, archive_path: str, root: str, file_url_prefix: str = "", gzip_level: Optional[int] = None,
+                 log: Optional[ConversionLog] = None):
+        super().__init__(file_url_prefix=file_url_prefix, gzip_level=gzip_level, log=log)
+        self.archive_path = archive_path
+        self.root = root.removesuffix("/")
+        if archive_path.endswith(".zip"):
+            self.tar_mode = None
+        else:
+            self.tar_mode = next((mode for suffix, mode in ARCHIVE_TAR_MODES.items() if archive_path.endswith(suffix)),
+                                 None)
+            if self.tar_mode is None:
+                raise ValueError(f"unsupported archive type: {archive_path}, expected .zip, "
+                                 f"{', '.join(ARCHIVE_TAR_MODES)}")
+        self.archive = None
+        self.lock = threading.Lock()
+
+    def read_json(self, path: str, quiet: bool = False) -> Any:
+        if not self._is_output(path):
+            return super().read_json(path, quiet)
+        if not quiet:
+            self._log_reading_file(self.archive_path, f": {self._relative_path(path)}")
+        return orjson.loads(self._read_previous_entry(self._relative_path(path)))
+
+    def exists(self, path: str) -> bool:
+        if not self._is_output(path):
+            return super().exists(path)
+        return self._read_previous_entry(self._relative_path(path)) is not None
+
+    def close(self) -> None:
+        if self.archive is not None:
+            self.archive.close()
+            self.archive = None
+            os.replace(self._part_path(), self.archive_path)
+
+    def _write_bytes(self, path: str, content: bytes) -> None:
+        name = self._relative_path(path)
+        self._add_entry(name, content)
+        if self.gzip_level is not None:
+            self._add_entry(f"{name}.gz", gzip.compress(content, compresslevel=self.gzip_level, mtime=0))
+
+    def _add_entry(self, name: str, content: bytes) -> None:
+        with self.lock:
+            self._add_entry_unlocked(name, content)
+
+    def _add_entry_unlocked(self, name: str, content: bytes) -> None:
+        import tarfile
+        import zipfile
+
+        if self.archive is None:
+            if self.tar_mode is None:
+                self.archive = zipfile.ZipFile(self._part_path(), mode='w', compression=zipfile.ZIP_DEFLATED)
+            else:
+                self.archive = tarfile.open(self._part_path(), mode=self.tar_mode)
+        if self.tar_mode is None:
+            self.archive.writestr(zipfile.ZipInfo(name, date_time=ZIP_DATE_TIME), content,
+                                  compress_type=zipfile.ZIP_DEFLATED)
+        else:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            info.mode = 0o644
+            self.archive.addfile(info, io.BytesIO(content))
+
+    def _add_generated_file(self, path: str):
+        self.generated_file_urls.append(f"{self.file_url_prefix}{self._relative_path(path)}")
+
+    def _relative_path(self, path: str) -> str:
+        return path.removeprefix(f"{self.root}/")
+
+    def _is_output(self, path: str) -> bool:
+        return path.startswith(f"{self.root}/")
+
+    def _part_path(self) -> str:
+        return f"{self.archive_path}.part"
+
+    def _read_previous_entry(self, name: str) -> Optional[bytes]:
+        import tarfile
+        import zipfile
+
+        if not os.path.exists(self.archive_path):
+            return None
+        if self.tar_mode is None:
+            with zipfile.ZipFile(self.archive_path) as archive:
+                try:
+                    return archive.read(name)
+                except KeyError:
+                    return None
+        with tarfile.open(self.archive_path) as archive:
+            try:
+                return archive.extractfile(name).read()
+            except KeyError:
+                return None
@@ -1,105 +1,147 @@
+import copy
+import hashlib
 import os
 import sys
 import traceback
-from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
-from typing import Any, Dict, Union
-
-import xmltodict
-from loguru import logger
+import xml.sax
+from typing import Any, Union
 
+from editem_apparatus.cli import menu_main
 from editem_apparatus.configs import EditemConfig
-from editem_apparatus.io_tools import IOHandler
+from editem_apparatus.conversion_log import ConversionLog
+from editem_apparatus.io_tools import IOHandler, MemoryIOHandler
+from editem_apparatus.menu_handler import MenuHandler
+from editem_apparatus.validation import MENU_CAPTURE_ELEMENTS, MENU_REQUIRED_ATTRIBUTES, validate_files
 
 ns = {'xml': 'http://www.w3.org/XML/1998/namespace'}
 
-rw = IOHandler()
-
 
 class MenuConverter:
     def __init__(self, config: EditemConfig):
         self.apparatus_directory = config.data_path.removesuffix("/")
         self.output_directory = config.export_path.removesuffix("/")
         self.file_url_prefix = config.file_url_prefix
+        self.apparatus_path = config.apparatus_path
+        self.apparatus_export_path = config.apparatus_export_path
         self.errors = []
-        if not config.show_progress:
-            logger.remove()
-            logger.add(sys.stderr, level="WARNING")
-        if config.log_file_path:
-            logger.remove()
-            if os.path.exists(config.log_file_path):
-                os.remove(config.log_file_path)
-            logger.add(config.log_file_path)
+        self.log = ConversionLog(config.show_progress, config.log_file_path)
+        self.rw = IOHandler(gzip_level=config.gzip_level, log=self.log)
+        self.validate = config.validate
 
     def convert(self) -> list[str]:
-        base_dir = self.apparatus_directory
-        xml_files = [xml for xml in os.listdir(base_dir) if xml.endswith("menu.xml")]
-        for xml_file in xml_files:
-            try:
-                base_name = xml_file.removesuffix(".xml")
-                export_dir = f"{self.output_directory}"
-                os.makedirs(export_dir, exist_ok=True)
-                self._process_xml(f"{base_dir}/{xml_file}", export_dir, base_name)
-            except Exception as e:
-                message = f"there was an error converting {xml_file}: {e}"
-                self.errors.append(message)
-                print(traceback.format_exc(), file=sys.stderr)
-        rw.report_generated_files()
-        return self.errors
+        with self.log:
+            base_dir = self.apparatus_directory
+            xml_files = [xml for xml in os.listdir(base_dir) if xml.endswith("menu.xml")]
+            if self.validate and not self._is_valid([f"{base_dir}/{xml_file}" for xml_file in xml_files]):
+                return self.errors
+            for xml_file in xml_files:
+                try:
+                    base_name = xml_file.removesuffix(".xml")
+                    export_dir = f"{self.output_directory}"
+                    os.makedirs(export_dir, exist_ok=True)
+                    self._process_xml(f"{base_dir}/{xml_file}", export_dir, base_name)
+                except Exception as e:
+                    message = f"there was an error converting {xml_file}: {e}"
+                    self.errors.append(message)
+                    print(traceback.format_exc(), file=sys.stderr)
+            self.rw.report_generated_files()
+            return self.errors
+
+    def _is_valid(self, xml_paths: list[str]) -> bool:
+        problems = validate_files(xml_paths, MENU_REQUIRED_ATTRIBUTES, MENU_CAPTURE_ELEMENTS)
+        for problem in problems:
+            self.log.error(problem)
+        self.errors.extend(problems)
+        return not problems
+
+    def convert_source(self, xml_source: Union[str, bytes], base_name: str) -> tuple[dict[str, Any], list[str]]:
+        """
+        Convert a single menu xml document in memory, without touching the filesystem.
+        Returns the generated outputs by file name, and the errors.
+        """
+        converter = copy.copy(self)
+        converter.rw = MemoryIOHandler(self.output_directory)
+        converter.errors = []
+        converter._convert_to_json(xml_source, self.output_directory, base_name)
+        return converter.rw.files, converter.errors
 
     def _process_xml(self, xml_path: str, output_dir: str, base_name: str):
-        xml_source = rw.read_text(xml_path)
+        xml_source = self.rw.read_text(xml_path)
         self._convert_to_json(xml_source, output_dir, base_name)
 
-    def _convert_to_json(self, xml: str, output_dir: str, base_name: str):
-        # export json conversion of complete xml file
-        xpars = xmltodict.parse(xml)
-        element_dict = self._simplify_keys(list(xpars.values())[0])
-        menubar = element_dict["standOff"]["menubar"]
-        simplified_menu = self._simplify_menu(menubar)
-        # self._print_menu_node(simplified_menu)
+    def _convert_to_json(self, xml_source: Union[str, bytes], output_dir: str, base_name: str):
+        handler = MenuHandler()
+        xml.sax.parseString(xml_source, handler)
+        if not handler.menubars:
+            raise ValueError("no standOff/menubar found")
+        if self.apparatus_path:
+            self._check_targets(handler.targets, base_name)
+        # self._print_menu_node(handler.menubar)
         path = f"{output_dir}/{base_name}.json"
-        rw.write_json(path, simplified_menu)
-
-    def _simplify_keys(self, kv_dict: dict[str, Any]) -> dict[str, Any]:
-        new_dict = {}
-        for key, value in kv_dict.items():
-            if not key.startswith("@xmlns"):
-                simplified_key = key.removeprefix("@").removeprefix("#").split(":")[-1]
-                if isinstance(value, Dict):
-                    new_dict[simplified_key] = self._simplify_keys(value)
-                elif isinstance(value, list):
-                    new_list = []
-                    for item in value:
-                        if isinstance(item, Dict):
-                            new_list.append(self._simplify_keys(item))
-                        else:
-                            new_list.append(item)
-                    new_dict[simplified_key] = new_list
-                else:
-                    new_dict[simplified_key] = value
-        return new_dict
-
-    def _simplify_menu(self, node: Union[dict, list, str]) -> Union[dict, list, str]:
-        if isinstance(node, list):
-            return [self._simplify_menu(item) for item in node]
-
-        if isinstance(node, dict):
-            new_node = {}
-            for key, value in node.items():
-                if key == "menuitem":
-                    if isinstance(value, dict):
-                        value_list = [value]
-                    else:
-                        value_list = value
-                    new_node["items"] = [self._simplify_menu(v) for v in value_list]
-                elif key == "ptr":
-                    # Compact ptr.target → target
-                    new_node["target"] = value["target"].replace(".xml", "")
-                else:
-                    new_node[key] = self._simplify_menu(value)
-            return new_node
-
-        return node
+        self.rw.write_json(path, handler.menubar)
+        if self.apparatus_export_path:
+            self._export_prefetch_manifest(handler.targets, output_dir, base_name)
+
+    def _check_targets(self, targets: list[str], base_name: str):
+        existing_files = set(os.listdir(self.apparatus_path))
+        broken_targets = sorted({t for t in targets if t.split("#")[0] not in existing_files})
+        if broken_targets:
+            error = (f"{base_name}.xml has {len(broken_targets)} menu target(s) not found in "
+                     f"{self.apparatus_path}: {', '.join(broken_targets)}")
+            self.log.error(error)
+            self.errors.append(error)
+
+    def _export_prefetch_manifest(self, targets: list[str], output_dir: str, base_name: str):
+        """
+        Write `{base_name}-prefetch.json`: for every menu target (as in the menu), the files that the apparatus
+        converter generated for it, with their size and a sha256 content hash to use as ETag.
+        """
+        export_path = self.apparatus_export_path.removesuffix("/")
+        files_per_base = self._generated_files_per_base_name(export_path)
+        file_infos: dict[str, dict[str, Any]] = {}
+        manifest = {}
+        missing_targets = set()
+        for target in targets:
+            files = files_per_base.get(target.split("#")[0].removesuffix(".xml"), [])
+            if not files:
+                missing_targets.add(target)
+            for file_name in files:
+                if file_name not in file_infos:
+                    file_infos[file_name] = self._file_info(export_path, file_name)
+            manifest[target.replace(".xml", "")] = [file_infos[file_name] for file_name in files]
+        if missing_targets:
+            error = (f"{base_name}.xml has {len(missing_targets)} menu target(s) without generated files in "
+                     f"{export_path}: {', '.join(sorted(missing_targets))}")
+            self.log.error(error)
+            self.errors.append(error)
+        self.rw.write_json(f"{output_dir}/{base_name}-prefetch.json", manifest)
+
+    @staticmethod
+    def _generated_files_per_base_name(export_path: str) -> dict[str, list[str]]:
+        # every converted apparatus file has a {base}.json and a {base}.html; the other generated files start with
+        # `{base}.` or `{base}-`, and belong to the longest base name they start with
+        if not os.path.isdir(export_path):
+            return {}
+        file_names = sorted(f for f in os.listdir(export_path) if not f.endswith(".gz"))
+        json_bases = {f.removesuffix(".json") for f in file_names if f.endswith(".json")}
+        html_bases = {f.removesuffix(".html") for f in file_names if f.endswith(".html")}
+        base_names = sorted(json_bases & html_bases, key=len, reverse=True)
+        files_per_base: dict[str, list[str]] = {}
+        for file_name in file_names:
+            owner = next((b for b in base_names if file_name.startswith((f"{b}.", f"{b}-"))), None)
+            if owner is not None:
+                files_per_base.setdefault(owner, []).append(file_name)
+        return files_per_base
+
+    @staticmethod
+    def _file_info(export_path: str, file_name: str) -> dict[str, Any]:
+        with open(f"{export_path}/{file_name}", 'rb') as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        return {
+            "file": file_name,
+            "bytes": os.path.getsize(f"{export_path}/{file_name}"),
+            "etag": f'"{digest}"'
+        }
 
     def _print_menu_node(self, node: Union[dict, list, str], depth: int = 0) -> None:
         indent = "  " * depth
@@ -120,36 +162,7 @@ class MenuConverter:
 
 
 def main():
-    parser = ArgumentParser(
-        description="Convert editem menu config to json",
-        formatter_class=ArgumentDefaultsHelpFormatter)
-    parser.add_argument('-i', '--inputdir', help="Input (data) Directory", type=str, required=True)
-    parser.add_argument('-o', '--outputdir', help="Output (export) Directory", type=str, required=True)
-    parser.add_argument('-l', '--logfile', help="Log file (output)", type=str, default=None)
-    parser.add_argument('--ignore-errors', help="Ignore errors", action='store_true')
-    args = parser.parse_args()
-
-    if args.ignore_errors:
-        logger.remove()
-        logger.add(sink=sys.stderr, level="WARNING")
-
-    config = EditemConfig(
-        data_path=args.inputdir,
-        export_path=args.outputdir,
-        show_progress=False,
-        log_file_path=args.logfile,
-    )
-
-    errors = MenuConverter(config).convert()
-    if errors:
-        for error in errors:
-            logger.error(error)
-        if args.ignore_errors:
-            sys.exit(0)
-        else:
-            sys.exit(1)
-    else:
-        sys.exit(0)
+    menu_main()
 
 
 if __name__ == '__main__':
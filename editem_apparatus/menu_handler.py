@@ -0,0 +1,85 @@
+from typing import Any, Optional
+from xml.sax import ContentHandler
+
+MENUBAR_PATH = ["standOff", "menubar"]
+
+
+class MenuHandler(ContentHandler):
+    """
+    Builds the simplified menu (`label`, `target`, `items`) of the standOff/menubar directly from the parser events,
+    with the same structure as xmltodict would give after simplifying the keys:
+    attributes and child elements become keys without their namespace prefix, text becomes `text`,
+    repeated keys (and several menubars) become lists; every `menuitem` is collected in an `items` list,
+    and `ptr/@target` becomes `target`, without the `.xml` extension.
+    """
+
+    def __init__(self):
+        self.menubars = []
+        self.targets = []
+        self.path = []
+        self.stack = []
+        self.item = None
+        self.data = []
+
+    def startElement(self, name, attrs):
+        local_name = name.split(":")[-1]
+        self.path.append(local_name)
+        if self._in_menubar():
+            self.stack.append((self.item, self.data))
+            item = {}
+            for key, value in attrs.items():
+                if not key.startswith("xmlns"):
+                    self._push(item, key.split(":")[-1], value)
+            self.item = item or None
+            self.data = []
+
+    def endElement(self, name):
+        if self._in_menubar():
+            data = "".join(self.data).strip() or None
+            item = self.item
+            self.item, self.data = self.stack.pop()
+            if item is not None and data:
+                self._push(item, "text", data)
+            value = item if item is not None else data
+            if len(self.path) == len(MENUBAR_PATH) + 1:
+                self.menubars.append(value)
+            else:
+                self.item = self._add_child(self.item, self.path[-1], value)
+        self.path.pop()
+
+    def characters(self, content):
+        if self._in_menubar():
+            self.data.append(content)
+
+    @property
+    def menubar(self) -> Any:
+        """The menubar, or the list of menubars when there are several (like xmltodict); None without menubar."""
+        if not self.menubars:
+            return None
+        return self.menubars[0] if len(self.menubars) == 1 else self.menubars
+
+    def _in_menubar(self) -> bool:
+        return self.path[1:len(MENUBAR_PATH) + 1] == MENUBAR_PATH
+
+    def _add_child(self, item: Optional[dict[str, Any]], key: str, value: Any) -> dict[str, Any]:
+        if item is None:
+            item = {}
+        if key == "menuitem":
+            item.setdefault("items", []).append(value)
+        elif key == "ptr":
+            target = value["target"]
+            self.targets.append(target)
+            item["target"] = target.replace(".xml", "")
+        else:
+            self._push(item, key, value)
+        return item
+
+    @staticmethod
+    def _push(item: dict[str, Any], key: str, value: Any):
+        if key in item:
+            if isinstance(item[key], list):
+                item[key].append(value)
+            else:
+                item[key] = [item[key], value]
+        else:
+            item[key] = value
@@ -0,0 +1,132 @@
+"""
+A small staged pipeline: items flow through a list of stages, connected by bounded queues.
+
+Every stage runs its function in its own worker threads. A full queue blocks the stage that feeds it
+(backpressure), so a slow stage limits how far the stages before it can get ahead.
+A stage function that returns None drops the item. When a stage function raises an exception,
+the pipeline stops taking new items, drains the queues, stops all workers and re-raises the exception.
+"""
+import queue
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Iterable, Optional
+
+_END = object()
+
+
+@dataclass
+class Stage:
+    name: str
+    function: Callable[[Any], Any]
+    workers: int = 1
+
+
+@dataclass
+class StageStats:
+    name: str
+    workers: int
+    processed: int = 0
+    busy_seconds: float = 0.0
+    max_queue_depth: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def throughput(self) -> float:
+        """Items per second of work, per worker."""
+        return self.processed / self.busy_seconds if self.busy_seconds else 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "stage": self.name,
+            "workers": self.workers,
+            "processed": self.processed,
+            "busySeconds": round(self.busy_seconds, 6),
+            "throughput": round(self.throughput, 3),
+            "maxQueueDepth": self.max_queue_depth
+        }
+
+
+class Pipeline:
+    def __init__(self, stages: list[Stage], queue_size: int = 4):
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        for stage in stages:
+            if stage.workers < 1:
+                raise ValueError(f"stage {stage.name} needs at least 1 worker, not {stage.workers}")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.stats = [StageStats(stage.name, stage.workers) for stage in stages]
+
+    def run(self, items: Iterable[Any]) -> list[StageStats]:
+        """Process all items, and return the statistics per stage."""
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        stopped = threading.Event()
+        errors: list[BaseException] = []
+        running_workers = [stage.workers for stage in self.stages]
+        running_lock = threading.Lock()
+
+        def put(stage_index: int, item: Any):
+            stage_queue = queues[stage_index]
+            stage_queue.put(item)
+            stats = self.stats[stage_index]
+            with stats.lock:
+                stats.max_queue_depth = max(stats.max_queue_depth, stage_queue.qsize())
+
+        def work(stage_index: int):
+            stage = self.stages[stage_index]
+            stats = self.stats[stage_index]
+            while True:
+                item = queues[stage_index].get()
+                if item is _END:
+                    break
+                if stopped.is_set():
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = stage.function(item)
+                except BaseException as e:
+                    errors.append(e)
+                    stopped.set()
+                    continue
+                finally:
+                    with stats.lock:
+                        stats.processed += 1
+                        stats.busy_seconds += time.perf_counter() - start
+                if result is not None and stage_index + 1 < len(self.stages):
+                    put(stage_index + 1, result)
+            with running_lock:
+                running_workers[stage_index] -= 1
+                last_worker = running_workers[stage_index] == 0
+            if last_worker and stage_index + 1 < len(self.stages):
+                for _ in range(self.stages[stage_index + 1].workers):
+                    queues[stage_index + 1].put(_END)
+
+        threads = [threading.Thread(target=work, args=(i,), name=f"{stage.name}-{w + 1}", daemon=True)
+                   for i, stage in enumerate(self.stages) for w in range(stage.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for item in items:
+                if stopped.is_set():
+                    break
+                put(0, item)
+        finally:
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_END)
+            for thread in threads:
+                thread.join()
+        if errors:
+            raise errors[0]
+        return self.stats
+
+
+def parse_stage_workers(specs: Optional[list[str]]) -> dict[str, int]:
+    """Parse `stage=workers` specifications, like `parse=2`."""
+    workers = {}
+    for spec in specs or []:
+        name, _, count = spec.partition("=")
+        if not count.isdigit():
+            raise ValueError(f"invalid stage workers: {spec}, expected stage=number")
+        workers[name] = int(count)
+    return workers
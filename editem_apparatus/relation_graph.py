@@ -0,0 +1,86 @@
+"""
+The relations between the entities of a project as a compact graph, so clients can look up the neighbours
+of an entity in both directions without building the graph themselves.
+
+Nodes are numbered; `nodes.ids[n]` is the `file#id` ref of node n, and `nodes.types[n]` an index in `nodeTypes`.
+The edges are stored in CSR (compressed sparse row) form, once per direction: the outgoing edges of node n are at
+positions `forward.offsets[n]` up to `forward.offsets[n + 1]` of `forward.targets` (the target nodes) and
+`forward.types` (indexes in `relationTypes`), in document order; `reverse` has the incoming edges in the same way,
+with the source nodes in `reverse.sources`.
+Relation targets that are not entities of the project are added as nodes without a type (-1).
+"""
+from typing import Any, Iterable
+
+UNKNOWN_TYPE = -1
+
+
+def build_relation_graph(nodes: Iterable[tuple[str, str]], relations: Iterable[tuple[str, str, str]]
+                         ) -> dict[str, Any]:
+    """
+    Build the graph of the `nodes` (ref, type) and the `relations` (source ref, relation name, target ref).
+    Nodes are numbered in the given order; the first occurrence of a ref counts.
+    """
+    node_types: list[str] = []
+    node_type_index: dict[str, int] = {}
+    node_index: dict[str, int] = {}
+    ids: list[str] = []
+    types: list[int] = []
+
+    def add_node(ref: str, node_type: int) -> int:
+        if ref not in node_index:
+            node_index[ref] = len(ids)
+            ids.append(ref)
+            types.append(node_type)
+        return node_index[ref]
+
+    for ref, node_type in nodes:
+        if node_type not in node_type_index:
+            node_type_index[node_type] = len(node_types)
+            node_types.append(node_type)
+        add_node(ref, node_type_index[node_type])
+
+    relation_types: list[str] = []
+    relation_type_index: dict[str, int] = {}
+    edges: list[tuple[int, int, int]] = []
+    for source, name, target in relations:
+        if name not in relation_type_index:
+            relation_type_index[name] = len(relation_types)
+            relation_types.append(name)
+        edges.append((add_node(source, UNKNOWN_TYPE), add_node(target, UNKNOWN_TYPE), relation_type_index[name]))
+
+    forward_offsets, forward_targets, forward_types = _compressed_rows(len(ids), edges, 0, 1)
+    reverse_offsets, reverse_sources, reverse_types = _compressed_rows(len(ids), edges, 1, 0)
+    return {
+        "nodes": {"ids": ids, "types": types},
+        "nodeTypes": node_types,
+        "relationTypes": relation_types,
+        "forward": {"offsets": forward_offsets, "targets": forward_targets, "types": forward_types},
+        "reverse": {"offsets": reverse_offsets, "sources": reverse_sources, "types": reverse_types},
+    }
+
+
+def neighbours(graph: dict[str, Any], node: int, direction: str = "forward") -> list[tuple[str, int]]:
+    """The (relation type, node) pairs of the outgoing (forward) or incoming (reverse) edges of `node`."""
+    edges = graph[direction]
+    others = edges["targets" if direction == "forward" else "sources"]
+    return [(graph["relationTypes"][edges["types"][i]], others[i])
+            for i in range(edges["offsets"][node], edges["offsets"][node + 1])]
+
+
+def _compressed_rows(node_count: int, edges: list[tuple[int, int, int]], row: int, column: int
+                     ) -> tuple[list[int], list[int], list[int]]:
+    # counting sort of the edges on their row node; the edges of a row keep their order
+    offsets = [0] * (node_count + 1)
+    for edge in edges:
+        offsets[edge[row] + 1] += 1
+    for n in range(node_count):
+        offsets[n + 1] += offsets[n]
+    columns = [0] * len(edges)
+    types = [0] * len(edges)
+    next_position = offsets[:-1]
+    for edge in edges:
+        position = next_position[edge[row]]
+        next_position[edge[row]] += 1
+        columns[position] = edge[column]
+        types[position] = edge[2]
+    return offsets, columns, types
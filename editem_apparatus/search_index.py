@@ -0,0 +1,67 @@
+import re
+import unicodedata
+from typing import Any
+
+LABEL_FIELDS = ["displayLabel", "sortLabel"]
+
+token_pattern = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Split text into casefolded tokens with the diacritics removed, so `Israëls` is found with `israels`."""
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return token_pattern.findall(stripped)
+
+
+def is_lang_map(value: Any, languages: set[str]) -> bool:
+    return isinstance(value, dict) and len(value) > 0 and all(k in languages for k in value)
+
+
+def build_search_index(entities: list[dict[str, Any]], languages: set[str]) -> dict[str, Any]:
+    """
+    Build an inverted index from the label fields and the language fields of the entities.
+
+    `terms` is sorted, so clients can find all terms with a given prefix with a binary search;
+    `postings[i]` lists the positions (in `ids`) of the entities containing `terms[i]`.
+    """
+    postings: dict[str, set[int]] = {}
+    for position, entity in enumerate(entities):
+        for text in _searchable_texts(entity, languages):
+            for token in tokenize(text):
+                postings.setdefault(token, set()).add(position)
+    terms = sorted(postings)
+    return {
+        "ids": [entity.get("id") for entity in entities],
+        "terms": terms,
+        "postings": [sorted(postings[term]) for term in terms]
+    }
+
+
+def find_duplicate_labels(entities: list[dict[str, Any]], label_field: str = "displayLabel") -> dict[str, list[str]]:
+    ids_for_label: dict[str, list[str]] = {}
+    for entity in entities:
+        label = entity.get(label_field)
+        if isinstance(label, str):
+            ids_for_label.setdefault(label, []).append(entity.get("id"))
+    return {label: ids for label, ids in ids_for_label.items() if len(ids) > 1}
+
+
+def _searchable_texts(entity: dict[str, Any], languages: set[str]) -> list[str]:
+    texts = [entity[field] for field in LABEL_FIELDS if isinstance(entity.get(field), str)]
+    for value in entity.values():
+        lang_maps = value if isinstance(value, list) else [value]
+        for lang_map in lang_maps:
+            if is_lang_map(lang_map, languages):
+                texts.extend(_strings(lang_map))
+    return texts
+
+
+def _strings(value: Any) -> list[str]:
+    if isinstance(value, str):
+        return [value]
+    elif isinstance(value, dict):
+        return [s for v in value.values() for s in _strings(v)]
+    elif isinstance(value, list):
+        return [s for v in value for s in _strings(v)]
+    return []
@@ -0,0 +1,102 @@
+import random
+from xml.sax.saxutils import escape
+
+FORENAMES = ["Vincent", "Theo", "Johanna", "Isaac", "Jozef", "Émilie", "Anna", "Cornelis Gabriel", "Kees", "Sien"]
+NAME_LINKS = ["", "", "", "van", "de", "van der", "ter"]
+SURNAMES = ["Gogh", "Israëls", "Bonger", "Kleykamp", "Mauve", "Rappard", "Breitner", "Ëlsberg", "Witsen", "Toorop"]
+WORDS = ["brief", "schets", "portret", "landschap", "studie", "molen", "zee", "duinen", "bloemen", "stad"]
+
+TEI_HEADER = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader><fileDesc><titleStmt><title>{title}</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+"""
+TEI_FOOTER = """    </body>
+  </text>
+</TEI>
+"""
+
+
+def synthetic_apparatus(persons: int = 1000, artworks: int = 500, bibls: int = 500, seed: int = 0) -> dict[str, str]:
+    """
+    Generate a deterministic apparatus corpus (bio.xml, artwork.xml, bibliography.xml) of the given size,
+    using the constructs the converters handle: name parts, lang-tagged notes, graphics, relations, heads and hi.
+    """
+    rnd = random.Random(seed)
+    return {
+        "bio.xml": _bio_xml(rnd, persons),
+        "artwork.xml": _artwork_xml(rnd, artworks, persons),
+        "bibliography.xml": _bibliography_xml(rnd, bibls),
+    }
+
+
+def synthetic_illustration_sizes(artworks: int = 500, seed: int = 0) -> str:
+    rnd = random.Random(seed)
+    lines = ["file\twidth\theight"]
+    for i in range(1, artworks + 1):
+        lines.append(f"F{i:05d}\t{rnd.randint(400, 4000)}\t{rnd.randint(400, 4000)}")
+    return "\n".join(lines) + "\n"
+
+
+def _words(rnd: random.Random, n: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+
+def _bio_xml(rnd: random.Random, persons: int) -> str:
+    parts = [TEI_HEADER.format(title="Persons"), "      <listPerson>\n"]
+    for i in range(1, persons + 1):
+        forename = rnd.choice(FORENAMES)
+        name_link = rnd.choice(NAME_LINKS)
+        surname = rnd.choice(SURNAMES)
+        name_link_xml = f"<nameLink>{name_link}</nameLink> " if name_link else ""
+        parts.append(f'        <person xml:id="pers{i:05d}" sex="{rnd.randint(1, 2)}">\n')
+        parts.append(f'          <persName full="yes"><forename>{forename} {rnd.choice(FORENAMES)}</forename> '
+                     f'{name_link_xml}<surname>{surname}</surname></persName>\n')
+        if rnd.random() < 0.3:
+            parts.append(f'          <persName full="abb"><forename>{forename}</forename> '
+                         f'{name_link_xml}<surname>{surname}</surname></persName>\n')
+        parts.append(f'          <birth when="{rnd.randint(1800, 1900)}"/>\n')
+        parts.append(f'          <note xml:lang="nl">{_words(rnd, 6)}</note>\n')
+        if rnd.random() < 0.5:
+            parts.append(f'          <note xml:lang="en">{_words(rnd, 6)}</note>\n')
+        parts.append('        </person>\n')
+    parts.append("      </listPerson>\n")
+    parts.append(TEI_FOOTER)
+    return "".join(parts)
+
+
+def _artwork_xml(rnd: random.Random, artworks: int, persons: int) -> str:
+    parts = [TEI_HEADER.format(title="Artworks")]
+    for list_id in ("paintings", "drawings"):
+        parts.append(f'      <listObject xml:id="{list_id}">\n')
+        for i in range(1, artworks + 1):
+            if (i % 2 == 0) != (list_id == "drawings"):
+                continue
+            parts.append(f'        <object xml:id="art{i:05d}">\n')
+            parts.append(f'          <head type="title" xml:lang="nl">{_words(rnd, 3)}</head>\n')
+            parts.append(f'          <head type="title" xml:lang="en">{_words(rnd, 3)}</head>\n')
+            parts.append(f'          <graphic url="F{i:05d}"/>\n')
+            for _ in range(rnd.randint(1, 3)):
+                parts.append(f'          <relation name="{rnd.choice(["creator", "depicts"])}"'
+                             f' ref="bio.xml#pers{rnd.randint(1, persons):05d}"/>\n')
+            parts.append('        </object>\n')
+        parts.append('      </listObject>\n')
+    parts.append(TEI_FOOTER)
+    return "".join(parts)
+
+
+def _bibliography_xml(rnd: random.Random, bibls: int) -> str:
+    parts = [TEI_HEADER.format(title="Bibliography")]
+    for list_id, head in (("primary", "Primary sources"), ("secondary", "Secondary literature")):
+        parts.append(f'      <listBibl xml:id="{list_id}">\n        <head>{head}</head>\n')
+        for i in range(1, bibls + 1):
+            if (i % 2 == 0) != (list_id == "secondary"):
+                continue
+            title = escape(_words(rnd, 4))
+            parts.append(f'        <bibl xml:id="bib{i:05d}"><author>{rnd.choice(SURNAMES)}</author>, '
+                         f'<title level="{rnd.choice("am")}">{title}</title>, '
+                         f'see https://example.org/bibl/{i} <hi rend="italic">{_words(rnd, 1)}</hi></bibl>\n')
+        parts.append('      </listBibl>\n')
+    parts.append(TEI_FOOTER)
+    return "".join(parts)
@@ -0,0 +1,65 @@
+"""
+Flat exports of the apparatus entities, one table per entity type, for bulk loading into a database.
+The columns of every table are fixed, so the tables of all projects and runs can be loaded with the same statement;
+fields that an entity does not have are None (`\\N` in tsv, empty in csv).
+"""
+from typing import Any, Iterable, Iterator, Optional
+
+PERSON_COLUMNS = ["id", "file", "list", "displayLabel", "sortLabel", "forename", "nameLink", "surname", "addName",
+                  "genName", "sex", "birth", "death"]
+BIBL_COLUMNS = ["id", "file", "list", "author", "title", "titleLevel", "text"]
+OBJECT_COLUMNS = ["id", "file", "list", "graphicUrl", "width", "height"]
+RELATION_COLUMNS = ["source", "name", "target", "label"]
+
+TABLES = {
+    "persons": PERSON_COLUMNS,
+    "bibls": BIBL_COLUMNS,
+    "objects": OBJECT_COLUMNS,
+    "relations": RELATION_COLUMNS,
+}
+
+
+def text_value(value: Any) -> Optional[str]:
+    """
+    The text of a simplified xml value: strings as is, `text` (or `when`) of objects, lists joined with `; `;
+    None when there is no text.
+    """
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "; ".join(t for t in (text_value(v) for v in value) if t) or None
+    if isinstance(value, dict):
+        for key in ("text", "when"):
+            if key in value:
+                return text_value(value[key])
+        return None
+    return str(value)
+
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+
+def bibl_row(entity: dict[str, Any], file: str, list_id: Optional[str]) -> list[Any]:
+    title = _first(entity.get("title"))
+    title_level = title.get("level") if isinstance(title, dict) else None
+    text = text_value(entity.get("text"))
+    return [entity.get("id"), file, list_id, text_value(entity.get("author")), text_value(title), title_level,
+            text.strip() if text is not None else None]
+
+
+def object_row(entity: dict[str, Any], file: str, list_id: Optional[str]) -> list[Any]:
+    graphic = _first(entity.get("graphic"))
+    if not isinstance(graphic, dict):
+        graphic = {}
+    return [entity.get("id"), file, list_id, graphic.get("url"), graphic.get("width"), graphic.get("height")]
+
+
+def relation_rows(entities: Iterable[dict[str, Any]], file: str) -> Iterator[list[Any]]:
+    for entity in entities:
+        relations = entity.get("relation", [])
+        for relation in [relations] if isinstance(relations, dict) else relations:
+            if "ref" in relation:
+                yield [f"{file}#{entity.get('id')}", relation.get("name"), relation["ref"], relation.get("label")]
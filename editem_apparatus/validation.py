@@ -0,0 +1,68 @@
+import os
+from xml.parsers import expat
+
+# attributes that the handlers use without checking (`attrs[...]`), by element, and the elements in which the
+# handlers capture; the entity parsing of the apparatus checks the attributes it uses itself
+APPARATUS_REQUIRED_ATTRIBUTES = {"hi": ["rend"]}
+APPARATUS_CAPTURE_ELEMENTS = ["titleStmt", "body"]
+HOME_REQUIRED_ATTRIBUTES = {"hi": ["rend"], "head": ["level"], "listBibl": ["xml:id"]}
+HOME_CAPTURE_ELEMENTS = ["body"]
+MENU_REQUIRED_ATTRIBUTES = {"ptr": ["target"]}
+MENU_CAPTURE_ELEMENTS = ["menubar"]
+
+
+def validate_files(paths: list[str], required_attributes: dict[str, list[str]],
+                   capture_elements: list[str]) -> list[str]:
+    """
+    Check the xml files in a single streaming (expat) pass each, and return all problems found:
+    files that are not well-formed, xml:ids that are used more than once in the same file,
+    and elements inside the capture elements that lack a required attribute.
+    The same xml:id in different files is fine: entities are referred to as `file.xml#id`.
+    """
+    validator = _Validator(required_attributes, capture_elements)
+    for path in paths:
+        validator.validate(path)
+    return validator.problems
+
+
+class _Validator:
+    def __init__(self, required_attributes: dict[str, list[str]], capture_elements: list[str]):
+        self.required_attributes = required_attributes
+        self.capture_elements = capture_elements
+        self.problems = []
+
+    def validate(self, path: str):
+        file_name = os.path.basename(path)
+        parser = expat.ParserCreate()
+        capture_depth = 0
+        id_lines: dict[str, int] = {}
+
+        def start_element(name, attrs):
+            nonlocal capture_depth
+            line = parser.CurrentLineNumber
+            if name in self.capture_elements:
+                capture_depth += 1
+            elif capture_depth and name in self.required_attributes:
+                for attribute in self.required_attributes[name]:
+                    if attribute not in attrs:
+                        self.problems.append(f"{file_name}:{line}: <{name}> has no {attribute} attribute")
+            xml_id = attrs.get("xml:id")
+            if xml_id is not None:
+                if xml_id in id_lines:
+                    self.problems.append(f"{file_name}:{line}: duplicate xml:id \"{xml_id}\","
+                                         f" first used in {file_name}:{id_lines[xml_id]}")
+                else:
+                    id_lines[xml_id] = line
+
+        def end_element(name):
+            nonlocal capture_depth
+            if name in self.capture_elements:
+                capture_depth -= 1
+
+        parser.StartElementHandler = start_element
+        parser.EndElementHandler = end_element
+        try:
+            with open(path, 'rb') as f:
+                parser.ParseFile(f)
+        except expat.ExpatError as e:
+            self.problems.append(f"{file_name}:{e.lineno}: not well-formed: {expat.ErrorString(e.code)}")
@@ -0,0 +1,89 @@
+import itertools
+import xml.etree.ElementTree as ET
+from typing import Any, Union
+
+from loguru import logger
+
+TEI_NS = "http://www.tei-c.org/ns/1.0"
+LIST_TAGS = ["listObject", "listBibl", "listPerson"]
+
+ns = {'xml': 'http://www.w3.org/XML/1998/namespace', 'tei': TEI_NS}
+
+
+class StdlibXmlBackend:
+    name = "stdlib"
+
+    @staticmethod
+    def parse(xml: Union[str, bytes]) -> Any:
+        return ET.fromstring(xml)
+
+    @staticmethod
+    def text_node(root: Any) -> Any:
+        return root.find(f".//{{{TEI_NS}}}text")
+
+    @staticmethod
+    def list_elements(text_node: Any) -> list[Any]:
+        return list(
+            itertools.chain.from_iterable(
+                [text_node.findall(f".//{{{TEI_NS}}}{lt}", namespaces=ns) for lt in LIST_TAGS]
+            )
+        )
+
+    @staticmethod
+    def identified_elements(element: Any) -> list[Any]:
+        return element.findall(".//*[@xml:id]", namespaces=ns)
+
+    @staticmethod
+    def tostring(element: Any) -> bytes:
+        return ET.tostring(element, encoding='UTF-8')
+
+
+class LxmlXmlBackend:
+    """Same lookups as StdlibXmlBackend, with lxml parsing and precompiled XPath expressions."""
+    name = "lxml"
+
+    def __init__(self):
+        from lxml import etree
+        self.etree = etree
+        self._text_node = etree.XPath("(.//tei:text)[1]", namespaces=ns)
+        self._list_elements = [etree.XPath(f".//tei:{lt}", namespaces=ns) for lt in LIST_TAGS]
+        self._identified_elements = etree.XPath(".//*[@xml:id]")
+
+    def parse(self, xml: Union[str, bytes]) -> Any:
+        if isinstance(xml, str):
+            # lxml does not accept str input with an encoding declaration
+            xml = xml.encode('utf-8')
+        return self.etree.fromstring(xml)
+
+    def text_node(self, root: Any) -> Any:
+        found = self._text_node(root)
+        return found[0] if found else None
+
+    def list_elements(self, text_node: Any) -> list[Any]:
+        return list(itertools.chain.from_iterable(xpath(text_node) for xpath in self._list_elements))
+
+    def identified_elements(self, element: Any) -> list[Any]:
+        return self._identified_elements(element)
+
+    def tostring(self, element: Any) -> bytes:
+        return self.etree.tostring(element, encoding='UTF-8')
+
+
+def lxml_is_available() -> bool:
+    try:
+        import lxml.etree  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def get_xml_backend(name: str = "auto") -> Union[StdlibXmlBackend, LxmlXmlBackend]:
+    """Returns the lxml backend for "lxml" or "auto" when lxml is installed, the stdlib backend otherwise."""
+    if name not in ("auto", "lxml", "stdlib"):
+        raise ValueError(f"unknown xml backend: {name}, expected auto, lxml or stdlib")
+    if name != "stdlib":
+        if lxml_is_available():
+            return LxmlXmlBackend()
+        if name == "lxml":
+            logger.warning("lxml is not installed, using the stdlib xml backend")
+    return StdlibXmlBackend()
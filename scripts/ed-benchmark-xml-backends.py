@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+
+from loguru import logger
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.in_memory import in_memory_converter
+from editem_apparatus.synthetic_corpus import synthetic_apparatus
+from editem_apparatus.xml_backend import lxml_is_available
+
+
+def main():
+    parser = ArgumentParser(
+        description="Compare the conversion time of the stdlib and lxml xml backends on a synthetic corpus",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-n', '--persons', help="Number of persons (artworks and bibls: half of that)", type=int,
+                        default=5000)
+    parser.add_argument('-r', '--repeat', help="Number of runs per backend (the best is reported)", type=int,
+                        default=3)
+    args = parser.parse_args()
+    logger.remove()
+
+    corpus = synthetic_apparatus(persons=args.persons, artworks=args.persons // 2, bibls=args.persons // 2)
+    backends = ["stdlib", "lxml"] if lxml_is_available() else ["stdlib"]
+    outputs = {}
+    for backend in backends:
+        converter = in_memory_converter(ApparatusConverter, EditemApparatusConfig(
+            project_name="benchmark", data_path=".", export_path=".", xml_backend=backend, validate=False))
+        for file_name, xml in corpus.items():
+            base_name = file_name.removesuffix(".xml")
+            timings = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                files, _ = converter.convert_source(xml, base_name)
+                timings.append(time.perf_counter() - start)
+            outputs.setdefault(file_name, []).append(files)
+            print(f"{backend:8} {file_name:20} {min(timings):8.3f}s")
+    if len(backends) > 1:
+        identical = all(o[0] == o[1] for o in outputs.values())
+        print(f"outputs identical: {identical}")
+    else:
+        print("lxml is not installed, only the stdlib backend was measured")
+
+
+if __name__ == '__main__':
+    main()
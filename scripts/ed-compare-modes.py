@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import sys
+import tempfile
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from functools import partial
+
+from loguru import logger
+
+from editem_apparatus.apparatus_converter import iiif_graphic_url
+from editem_apparatus.differential import MODES, compare_modes
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.synthetic_corpus import synthetic_apparatus, synthetic_illustration_sizes
+
+
+def main():
+    parser = ArgumentParser(
+        description="Convert an apparatus in the reference mode and in the optional (faster) modes, "
+                    "and report every output file that differs, with timings",
+        formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-i', '--inputdir', help="Apparatus directory (default: a synthetic corpus)", type=str)
+    parser.add_argument('-s', '--sizes', help="Illustration sizes file", type=str)
+    parser.add_argument('-b', '--base-url', help="URL for the IIIF image server", type=str,
+                        default="https://example.org/iiif/3")
+    parser.add_argument('-n', '--persons', help="Number of persons in the synthetic corpus "
+                                                "(artworks and bibls: half of that)", type=int, default=2000)
+    parser.add_argument('-m', '--modes', help="Modes to compare with the reference", nargs='+',
+                        choices=list(MODES), default=list(MODES))
+    parser.add_argument('--search-index', help="Also compare the search indexes", action='store_true')
+    parser.add_argument('--page-size', help="Also compare the entity pages of this size", type=int, default=None)
+    args = parser.parse_args()
+    logger.remove()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inputdir, sizes = args.inputdir, args.sizes
+        if inputdir is None:
+            inputdir = tmp_dir
+            artworks = args.persons // 2
+            for file_name, xml in synthetic_apparatus(args.persons, artworks, artworks).items():
+                with open(f"{tmp_dir}/{file_name}", 'w', encoding='utf-8') as f:
+                    f.write(xml)
+            sizes = f"{tmp_dir}/sizes.tsv"
+            with open(sizes, 'w', encoding='utf-8') as f:
+                f.write(synthetic_illustration_sizes(artworks))
+        config = EditemApparatusConfig(
+            project_name="compare", data_path=inputdir, export_path=tmp_dir,
+            graphic_url_mapper=partial(iiif_graphic_url, base_url=args.base_url, project="compare"),
+            illustration_sizes_file=sizes, search_index=args.search_index, page_size=args.page_size,
+            change_feed=True)
+        comparisons = compare_modes(config, args.modes)
+
+    has_differences = False
+    for comparison in comparisons:
+        print(f"{comparison.mode}: {comparison.seconds:.3f}s (reference {comparison.reference_seconds:.3f}s,"
+              f" speedup {comparison.speedup:.2f}x)")
+        if comparison.is_identical:
+            print("- identical output")
+        for file_name, difference in comparison.differences.items():
+            has_differences = True
+            print(f"- {file_name}: {difference}")
+    sys.exit(1 if has_differences else 0)
+
+
+if __name__ == '__main__':
+    main()
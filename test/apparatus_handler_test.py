@@ -0,0 +1,40 @@
+import unittest
+import xml.sax
+
+from editem_apparatus.apparatus_handler import ApparatusHandler
+
+BIBLIOGRAPHY_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <text>
+    <body>
+      <listBibl xml:id="primary">
+        <head>Primary <hi rend="italic">sources</hi></head>
+        <bibl xml:id="bib001"><title level="m">Brieven</title></bibl>
+        <bibl xml:id="bib002"><title level="a">Een artikel</title></bibl>
+      </listBibl>
+    </body>
+  </text>
+</TEI>"""
+
+
+class ApparatusHandlerTestCase(unittest.TestCase):
+    def test_fragments_are_collected_in_document_order(self):
+        handler = ApparatusHandler(collect_fragments=True)
+        xml.sax.parseString(BIBLIOGRAPHY_XML, handler)
+        self.assertEqual(["primary", "bib001", "bib002"], [f["id"] for f in handler.fragments])
+        primary, bib001, _ = handler.fragments
+        self.assertEqual("Primary sources", primary["head"])
+        self.assertIsNone(primary["parent"])
+        self.assertEqual("primary", bib001["parent"])
+        self.assertEqual('<div class="bibl" id="bib001"><span class="title_m">Brieven</span></div>', bib001["html"])
+        self.assertTrue(primary["html"].startswith('<div class="listBibl" id="primary">'))
+        self.assertIn(bib001["html"], primary["html"])
+        self.assertIn(primary["html"], handler.html_string)
+
+    def test_no_fragments_by_default(self):
+        handler = ApparatusHandler()
+        xml.sax.parseString(BIBLIOGRAPHY_XML, handler)
+        self.assertEqual([], handler.fragments)
+
+
+if __name__ == '__main__':
+    unittest.main()
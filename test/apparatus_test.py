@@ -1,7 +1,54 @@
+import csv
+import json
+import os
+import tarfile
+import tempfile
 import unittest
+import zipfile
+from functools import partial
 
-from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.apparatus_converter import ApparatusConverter, iiif_graphic_url
 from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.relation_graph import neighbours
+
+BIO_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader><fileDesc><titleStmt><title>Persons</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+      <listPerson>
+        <person xml:id="pers001"><persName><forename>Vincent</forename> <surname>Gogh</surname></persName></person>
+        <person xml:id="pers002"><persName><forename>Isaac</forename> <surname>Israels</surname></persName></person>
+        <person xml:id="pers003"><persName><forename>Anna</forename> <surname>Bonger</surname></persName></person>
+      </listPerson>
+    </body>
+  </text>
+</TEI>
+"""
+
+ARTWORK_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader><fileDesc><titleStmt><title>Artworks</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+      <listObject xml:id="artworks">
+        <object xml:id="art001"><relation name="creator" ref="bio.xml#pers001"/></object>
+      </listObject>
+    </body>
+  </text>
+</TEI>
+"""
+
+
+def write_apparatus(data_dir: str, files: dict[str, str]):
+    for name, xml in files.items():
+        with open(os.path.join(data_dir, name), 'w', encoding='utf-8') as f:
+            f.write(xml)
+
+
+def read_json(path: str):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
 
 
 class ApparatusTestCase(unittest.TestCase):
@@ -79,6 +126,272 @@ class ApparatusTestCase(unittest.TestCase):
         self.assertEqual("Cornelis Gabriel Kleykamp Slugger Jr", new_dict['pers026']["displayLabel"])
         self.assertEqual("Kleykamp Slugger Jr, Cornelis Gabriel", new_dict['pers026']["sortLabel"])
 
+    def test_relation_refs_get_labels(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir)
+            errors = ApparatusConverter(cf).convert()
+            self.assertEqual([], errors)
+            artworks = read_json(f"{export_dir}/artwork.artworks-entities.json")
+            self.assertEqual("Vincent Gogh", artworks[0]["relation"][0]["label"])
+
+    def test_paged_entities_with_manifest(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir, page_size=2)
+            ApparatusConverter(cf).convert()
+            manifest = read_json(f"{export_dir}/bio-entities.manifest.json")
+            self.assertEqual(3, manifest["count"])
+            self.assertEqual(["bio-entities.page-0001.json", "bio-entities.page-0002.json"],
+                             [p["file"] for p in manifest["pages"]])
+            first_page = manifest["pages"][0]
+            self.assertEqual(("pers003", "pers001"), (first_page["firstId"], first_page["lastId"]))
+            self.assertEqual(("Bonger, Anna", "Gogh, Vincent"), (first_page["firstLabel"], first_page["lastLabel"]))
+            self.assertEqual(os.path.getsize(f"{export_dir}/bio-entities.page-0001.json"), first_page["bytes"])
+            second_page = read_json(f"{export_dir}/bio-entities.page-0002.json")
+            self.assertEqual(["pers002"], [e["id"] for e in second_page])
+
+    def test_validation_fails_fast(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML.replace("pers002", "pers001"), "artwork.xml": ARTWORK_XML})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir)
+            errors = ApparatusConverter(cf).convert()
+            self.assertEqual(1, len(errors))
+            self.assertIn('duplicate xml:id "pers001"', errors[0])
+            self.assertEqual([], os.listdir(export_dir))
+
+    def test_same_id_in_different_files(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML.replace("art001", "pers001")})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir)
+            self.assertEqual([], ApparatusConverter(cf).convert())
+            self.assertEqual("pers001", read_json(f"{export_dir}/artwork.artworks-entities.json")[0]["id"])
+
+    def test_entities_without_optional_attributes(self):
+        bio_xml = BIO_XML.replace(
+            '<person xml:id="pers003"><persName><forename>Anna</forename> <surname>Bonger</surname></persName>',
+            '<person xml:id="pers003"><persName><forename>Anna</forename></persName>'
+            '<persName full="abb"><forename>A.</forename><surname>Bonger</surname><surname type="maiden"/></persName>'
+            '<note xml:lang="en" type="bio">painter</note><note type="bio">schilder</note>'
+            '<note xml:lang="en">x</note><note>y</note>').replace(
+            '</listPerson>', '<person xml:id="anon"><note>unknown</note></person></listPerson>')
+        artwork_xml = ARTWORK_XML.replace('bio.xml#pers001', 'bio.xml#anon')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": bio_xml, "artwork.xml": artwork_xml})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir)
+            errors = ApparatusConverter(cf).convert()
+            self.assertEqual(["invalid ref: bio.xml#anon for artwork.xml#art001"], errors)
+            persons = {p["id"]: p for p in read_json(f"{export_dir}/bio-entities.json")}
+            self.assertEqual("Bonger (), A.", persons["pers003"]["sortLabel"])
+            self.assertNotIn("displayLabel", persons["anon"])
+
+    def test_change_feed(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       change_feed=True)
+            ApparatusConverter(cf).convert()
+            changes = read_json(f"{export_dir}/entity-changes.json")
+            self.assertEqual(["pers001", "pers002", "pers003"], changes["bio"]["added"])
+
+            ApparatusConverter(cf).convert()
+            self.assertEqual({}, read_json(f"{export_dir}/entity-changes.json"))
+
+            # renaming pers001 changes the relation label of art001 as well
+            new_bio_xml = BIO_XML.replace("Vincent", "Theo").replace('"pers003"', '"pers004"')
+            write_apparatus(data_dir, {"bio.xml": new_bio_xml})
+            ApparatusConverter(cf).convert()
+            self.assertEqual({
+                "artwork": {"added": [], "modified": ["art001"], "removed": []},
+                "bio": {"added": ["pers004"], "modified": ["pers001"], "removed": ["pers003"]}
+            }, read_json(f"{export_dir}/entity-changes.json"))
+
+    def test_outputs_are_streamed_into_an_archive(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            ApparatusConverter(EditemApparatusConfig(project_name="test", data_path=data_dir,
+                                                     export_path=export_dir)).convert()
+            archive_path = f"{data_dir}/export.tar.gz"
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=f"{export_dir}/unused",
+                                       archive_path=archive_path)
+            self.assertEqual([], ApparatusConverter(cf).convert())
+            self.assertFalse(os.path.exists(f"{export_dir}/unused"))
+            with tarfile.open(archive_path) as archive:
+                self.assertEqual(sorted(os.listdir(export_dir)), sorted(archive.getnames()))
+                for name in archive.getnames():
+                    with open(f"{export_dir}/{name}", 'rb') as f:
+                        self.assertEqual(f.read(), archive.extractfile(name).read())
+
+    def test_change_feed_in_an_archive(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            archive_path = f"{export_dir}/export.zip"
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=f"{export_dir}/unused",
+                                       archive_path=archive_path, change_feed=True)
+            ApparatusConverter(cf).convert()
+            write_apparatus(data_dir, {"bio.xml": BIO_XML.replace("Vincent", "Theo")})
+            ApparatusConverter(cf).convert()
+            with zipfile.ZipFile(archive_path) as archive:
+                changes = json.loads(archive.read("entity-changes.json"))
+            self.assertEqual({
+                "artwork": {"added": [], "modified": ["art001"], "removed": []},
+                "bio": {"added": [], "modified": ["pers001"], "removed": []}
+            }, changes)
+            self.assertEqual(["export.zip"], os.listdir(export_dir))
+
+    def test_language_variants(self):
+        bio_xml = BIO_XML.replace('<surname>Gogh</surname></persName>',
+                                  '<surname>Gogh</surname></persName><note xml:lang="nl">schilder</note>'
+                                  '<note xml:lang="en">painter</note>')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": bio_xml})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       language_variants=["nl", "en", "fr"])
+            ApparatusConverter(cf).convert()
+            entities = read_json(f"{export_dir}/bio-entities.json")
+            self.assertEqual({"nl": {"text": "schilder"}, "en": {"text": "painter"}}, entities[0]["note"])
+            for lang, note in (("nl", {"text": "schilder"}), ("en", {"text": "painter"})):
+                variant = read_json(f"{export_dir}/bio-entities.{lang}.json")
+                self.assertEqual(note, variant[0]["note"])
+                self.assertEqual(entities[0]["displayLabel"], variant[0]["displayLabel"])
+                self.assertEqual(entities[1:], variant[1:])
+                self.assertEqual(note, read_json(f"{export_dir}/bio-entity-dict.{lang}.json")["bio/pers001"]["note"])
+            self.assertNotIn("note", read_json(f"{export_dir}/bio-entities.fr.json")[0])
+
+    def test_flat_tables(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       table_format="csv")
+            ApparatusConverter(cf).convert()
+            with open(f"{export_dir}/persons.csv", encoding='utf-8') as f:
+                persons = list(csv.reader(f))
+            self.assertEqual(["id", "file", "list", "displayLabel", "sortLabel", "forename", "nameLink", "surname",
+                              "addName", "genName", "sex", "birth", "death"], persons[0])
+            self.assertEqual(["pers001", "bio.xml", "", "Vincent Gogh", "Gogh, Vincent", "Vincent", "", "Gogh",
+                              "", "", "", "", ""], persons[1])
+            self.assertEqual(4, len(persons))
+            with open(f"{export_dir}/relations.csv", encoding='utf-8') as f:
+                self.assertEqual([["source", "name", "target", "label"],
+                                  ["artwork.xml#art001", "creator", "bio.xml#pers001", "Vincent Gogh"]],
+                                 list(csv.reader(f)))
+            with open(f"{export_dir}/objects.csv", encoding='utf-8') as f:
+                self.assertEqual(["art001", "artwork.xml", "artworks", "", "", ""], list(csv.reader(f))[1])
+            with open(f"{export_dir}/bibls.csv", encoding='utf-8') as f:
+                self.assertEqual([["id", "file", "list", "author", "title", "titleLevel", "text"]],
+                                 list(csv.reader(f)))
+
+    def test_iiif_size_hints(self):
+        artwork_xml = ARTWORK_XML.replace('<relation', '<graphic url="F0082"/><relation')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": artwork_xml})
+            sizes_file = f"{export_dir}/sizes.tsv"
+            with open(sizes_file, 'w', encoding='utf-8') as f:
+                f.write("file\twidth\theight\nF0082\t1200\t800\n")
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       graphic_url_mapper=partial(iiif_graphic_url, base_url="https://iiif.org/3",
+                                                                  project="test"),
+                                       illustration_sizes_file=sizes_file, thumbnail_widths=[400, 150, 2000])
+            ApparatusConverter(cf).convert()
+            url = "https://iiif.org/3/test|illustrations|F0082.jpg"
+            self.assertEqual({
+                "url": url,
+                "width": 1200,
+                "height": 800,
+                "aspectRatio": 1.5,
+                "sizes": [
+                    {"width": 150, "height": 100, "url": f"{url}/full/150,/0/default.jpg"},
+                    {"width": 400, "height": 267, "url": f"{url}/full/400,/0/default.jpg"},
+                    {"width": 1200, "height": 800, "url": f"{url}/full/1200,/0/default.jpg"}
+                ]
+            }, read_json(f"{export_dir}/artwork-entities.json")[0]["graphic"])
+
+    def test_iiif_size_hints_skip_zero_dimensions(self):
+        artwork_xml = ARTWORK_XML.replace('<relation', '<graphic url="F0082"/><relation')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": artwork_xml})
+            sizes_file = f"{export_dir}/sizes.tsv"
+            with open(sizes_file, 'w', encoding='utf-8') as f:
+                f.write("file\twidth\theight\nF0082\t1200\t0\n")
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       graphic_url_mapper=partial(iiif_graphic_url, base_url="https://iiif.org/3",
+                                                                  project="test"),
+                                       illustration_sizes_file=sizes_file, thumbnail_widths=[400])
+            errors = ApparatusConverter(cf).convert()
+            self.assertEqual(1, len(errors))
+            self.assertIn("zero width/height", errors[0])
+            graphic = read_json(f"{export_dir}/artwork-entities.json")[0]["graphic"]
+            self.assertEqual((1200, 0), (graphic["width"], graphic["height"]))
+            self.assertNotIn("sizes", graphic)
+
+    def test_missing_dimensions_give_one_error_per_graphic(self):
+        artwork_xml = ARTWORK_XML.replace(
+            '<object xml:id="art001"><relation name="creator" ref="bio.xml#pers001"/></object>',
+            '<object xml:id="art001"><graphic url="F0001"/></object>'
+            '<object xml:id="art002"><graphic url="F0002"/></object>'
+            '<object xml:id="art003"><graphic url="F0003"/></object>')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": artwork_xml})
+            sizes_file = f"{export_dir}/sizes.tsv"
+            with open(sizes_file, 'w', encoding='utf-8') as f:
+                f.write("file\twidth\theight\nF0002\t1200\t800\n")
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       graphic_url_mapper=partial(iiif_graphic_url, base_url="https://iiif.org/3",
+                                                                  project="test"),
+                                       illustration_sizes_file=sizes_file)
+            errors = ApparatusConverter(cf).convert()
+        self.assertEqual([f'missing width/height: no illustration dimensions found in {sizes_file}'
+                          f' for <graphic url="{url}"/> in artwork.xml' for url in ("F0001", "F0003")], errors)
+
+    def test_event_log_has_one_file_event_per_file(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML})
+            for pipeline in (False, True):
+                event_log = f"{export_dir}/events-{pipeline}.jsonl"
+                cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                           pipeline=pipeline, event_log_path=event_log)
+                self.assertEqual([], ApparatusConverter(cf).convert())
+                with open(event_log, encoding='utf-8') as f:
+                    events = [json.loads(line) for line in f]
+                files = sorted(e["file"] for e in events if e["event"] == "file")
+                self.assertEqual(["artwork.xml", "bio.xml"], files, f"pipeline={pipeline}")
+
+    def test_collation_keys(self):
+        bio_xml = BIO_XML.replace('<forename>Vincent</forename> <surname>Gogh</surname>',
+                                  '<forename>Vincent</forename> <nameLink>van</nameLink> <surname>Gogh</surname>')
+        bio_xml = bio_xml.replace('<surname>Israels</surname>', '<surname>Israëls</surname>')
+        for policy, expected_order in (("ignore", ["pers003", "pers001", "pers002"]),
+                                       ("include", ["pers003", "pers002", "pers001"])):
+            with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+                write_apparatus(data_dir, {"bio.xml": bio_xml})
+                cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                           collation_keys=True, name_link_policy=policy)
+                ApparatusConverter(cf).convert()
+                entities = read_json(f"{export_dir}/bio-entities.json")
+                self.assertEqual("israels isaac", entities[1]["collationKey"])
+                order = read_json(f"{export_dir}/bio-entities.order.json")["byCollationKey"]
+                self.assertEqual(expected_order, [entities[i]["id"] for i in order])
+
+    def test_relation_graph(self):
+        artwork_xml = ARTWORK_XML.replace('<relation name="creator" ref="bio.xml#pers001"/>',
+                                          '<relation name="creator" ref="bio.xml#pers001"/>'
+                                          '<relation name="depicts" ref="bio.xml#pers003"/>'
+                                          '<relation name="depicts" ref="bio.xml#pers001"/>')
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            write_apparatus(data_dir, {"bio.xml": BIO_XML, "artwork.xml": artwork_xml})
+            cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                       relation_graph=True)
+            ApparatusConverter(cf).convert()
+            graph = read_json(f"{export_dir}/relation-graph.json")
+            self.assertEqual(["artwork.xml#art001", "bio.xml#pers001", "bio.xml#pers002", "bio.xml#pers003"],
+                             graph["nodes"]["ids"])
+            self.assertEqual(["object", "person"], graph["nodeTypes"])
+            self.assertEqual([0, 1, 1, 1], graph["nodes"]["types"])
+            self.assertEqual([("creator", 1), ("depicts", 3), ("depicts", 1)], neighbours(graph, 0))
+            self.assertEqual([("creator", 0), ("depicts", 0)], neighbours(graph, 1, "reverse"))
+            self.assertEqual([], neighbours(graph, 2, "reverse"))
+            self.assertEqual([0, 0, 2, 2, 3], graph["reverse"]["offsets"])
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from editem_apparatus.batch_converter import convert_projects, load_projects
+
+BIO_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <text><body><listPerson>
+    <person xml:id="pers001"><persName><forename>Vincent</forename> <surname>Gogh</surname></persName></person>
+  </listPerson></body></text>
+</TEI>"""
+
+ARTWORK_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <text><body><listObject xml:id="artworks">
+    <object xml:id="art001"><relation name="creator" ref="bio.xml#pers999"/></object>
+  </listObject></body></text>
+</TEI>"""
+
+
+class BatchConverterTestCase(unittest.TestCase):
+    def test_projects_get_their_own_error_report(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            project_files = {"one": {"bio.xml": BIO_XML}, "two": {"bio.xml": BIO_XML, "artwork.xml": ARTWORK_XML}}
+            for project, files in project_files.items():
+                os.makedirs(f"{tmp_dir}/{project}")
+                for name, xml in files.items():
+                    with open(f"{tmp_dir}/{project}/{name}", 'w') as f:
+                        f.write(xml)
+            config_path = f"{tmp_dir}/projects.toml"
+            with open(config_path, 'w') as f:
+                f.write(f"""
+workers = 2
+
+[[project]]
+name = "one"
+inputdir = "{tmp_dir}/one"
+outputdir = "{tmp_dir}/out/one"
+search_index = true
+
+[[project]]
+name = "two"
+inputdir = "{tmp_dir}/two"
+outputdir = "{tmp_dir}/out/two"
+base_url = "https://example.org/iiif"
+
+[[project]]
+name = "three"
+inputdir = "{tmp_dir}/three"
+outputdir = "{tmp_dir}/out/three"
+no_such_setting = 1
+""")
+            projects, workers = load_projects(config_path)
+            self.assertEqual(2, workers)
+            one, two, three = convert_projects(projects, workers)
+            self.assertEqual([], one.errors)
+            self.assertTrue(os.path.exists(f"{tmp_dir}/out/one/bio-search-index.json"))
+            self.assertEqual(["invalid ref: bio.xml#pers999 for artwork.xml#art001"], two.errors)
+            self.assertTrue(os.path.exists(f"{tmp_dir}/out/two/artwork.artworks-entities.json"))
+            self.assertEqual(["convert_apparatus failed: unknown project setting(s): no_such_setting"], three.errors)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+from editem_apparatus.cli import apparatus_main, menu_main
+
+HEAVY_MODULES = ["lxml", "xmltodict", "loguru", "orjson", "toolz", "csv", "glob", "xml.etree.ElementTree",
+                 "typing_extensions", "editem_apparatus.apparatus_converter", "editem_apparatus.menu_converter",
+                 "editem_apparatus.home_converter", "editem_apparatus.batch_converter"]
+MAINS = ["apparatus_main", "menu_main", "home_main", "batch_main"]
+
+BIO_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <text><body><listPerson>
+    <person xml:id="pers001"><persName><forename>Vincent</forename> <surname>Gogh</surname></persName></person>
+  </listPerson></body></text>
+</TEI>"""
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class CliTestCase(unittest.TestCase):
+    def test_import_does_not_load_the_converters(self):
+        result = run_python(
+            "import sys\n"
+            "import editem_apparatus.cli\n"
+            f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules], file=sys.stderr)")
+        self.assertEqual("[]", result.stderr.strip())
+
+    def test_help_does_not_load_the_converters(self):
+        for main in MAINS:
+            result = run_python(
+                "import sys\n"
+                f"from editem_apparatus.cli import {main}\n"
+                "try:\n"
+                f"    {main}(['--help'])\n"
+                "except SystemExit:\n"
+                "    pass\n"
+                f"print([m for m in {HEAVY_MODULES!r} if m in sys.modules], file=sys.stderr)")
+            self.assertEqual("[]", result.stderr.strip(), main)
+
+    def test_apparatus_main(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            with open(f"{data_dir}/bio.xml", 'w', encoding='utf-8') as f:
+                f.write(BIO_XML)
+            with self.assertRaises(SystemExit) as context:
+                apparatus_main(["-p", "test", "-i", data_dir, "-o", export_dir, "-b", "https://example.org"])
+            self.assertEqual(0, context.exception.code)
+            self.assertTrue(os.path.exists(f"{export_dir}/bio-entities.json"))
+
+    def test_errors_are_written_to_the_log_file(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir:
+            with open(f"{data_dir}/bio.xml", 'w', encoding='utf-8') as f:
+                f.write(BIO_XML)
+            with open(f"{data_dir}/broken.xml", 'w', encoding='utf-8') as f:
+                f.write("<TEI>")
+            log_file = f"{export_dir}/convert.log"
+            with self.assertRaises(SystemExit) as context:
+                apparatus_main(["-p", "test", "-i", data_dir, "-o", export_dir, "-b", "https://example.org",
+                                "--skip-validation", "-l", log_file])
+            self.assertEqual(1, context.exception.code)
+            with open(log_file, encoding='utf-8') as f:
+                self.assertIn("there was an error converting broken.xml", f.read())
+
+    def test_missing_arguments(self):
+        with self.assertRaises(SystemExit) as context:
+            menu_main(["-i", "config"])
+        self.assertEqual(2, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
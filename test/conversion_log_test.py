@@ -0,0 +1,72 @@
+import json
+import sys
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from loguru import logger
+
+from editem_apparatus.conversion_log import ConversionLog
+
+
+class ConversionLogTestCase(unittest.TestCase):
+    def test_disabled_levels_are_not_formatted(self):
+        # like the cli: only warnings and errors to stderr
+        logger.remove()
+        logger.add(sys.stderr, level="WARNING")
+        calls = []
+
+        def value():
+            calls.append(1)
+            return "value"
+
+        with ConversionLog() as log:
+            log.info("not shown: {}", value)
+        self.assertEqual([], calls)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log_file = f"{tmp_dir}/convert.log"
+            with ConversionLog(log_file_path=log_file) as log:
+                log.info("shown: {}", value)
+            with open(log_file, encoding='utf-8') as f:
+                self.assertIn("shown: value", f.read())
+        self.assertEqual([1], calls)
+
+    def test_event_log_with_aggregated_warnings(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            event_log = f"{tmp_dir}/events.jsonl"
+            with ConversionLog(event_log_path=event_log) as log:
+                log.event("file", file="bio.xml", entities=3)
+                for i in range(12):
+                    log.aggregate_warning("missing dimensions", f"F{i:02d}")
+            with open(event_log, encoding='utf-8') as f:
+                events = [json.loads(line) for line in f]
+        self.assertEqual(["file", "aggregatedWarning"], [e["event"] for e in events])
+        self.assertEqual(("bio.xml", 3), (events[0]["file"], events[0]["entities"]))
+        self.assertEqual(12, events[1]["count"])
+        self.assertEqual("F11", events[1]["items"][-1])
+
+    def test_logging_configuration_of_the_application_is_left_alone(self):
+        messages = []
+        sink_id = logger.add(messages.append, level="INFO", format="{message}")
+        try:
+            with ConversionLog(show_progress=False) as log:
+                log.info("converting {}", lambda: "bio.xml")
+        finally:
+            logger.remove(sink_id)
+        self.assertEqual(["converting bio.xml\n"], messages)
+
+    def test_nested_uses_from_threads(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            log = ConversionLog(log_file_path=f"{tmp_dir}/convert.log")
+
+            def use_log(i: int):
+                with log:
+                    log.info("file {}", lambda: i)
+
+            with ThreadPoolExecutor(max_workers=8) as executor:
+                list(executor.map(use_log, range(200)))
+            self.assertEqual((0, []), (log.depth, log.sink_ids))
+
+
+if __name__ == '__main__':
+    unittest.main()
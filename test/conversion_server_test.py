@@ -0,0 +1,60 @@
+import json
+import threading
+import unittest
+import urllib.request
+
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.conversion_server import ConversionService, create_server
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+
+BIO_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader><fileDesc><titleStmt><title>Persons</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+      <listPerson>
+        <person xml:id="pers001"><persName><forename>Vincent</forename> <surname>Gogh</surname></persName></person>
+      </listPerson>
+    </body>
+  </text>
+</TEI>"""
+
+
+class ConversionServerTestCase(unittest.TestCase):
+    def setUp(self):
+        apparatus_config = EditemApparatusConfig(project_name="test", data_path=".", export_path=".")
+        self.service = ConversionService(apparatus_config, EditemConfig(data_path=".", export_path="."),
+                                         cache_size=1)
+        self.server = create_server(self.service, port=0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def _post(self, path: str, body: str):
+        request = urllib.request.Request(f"{self.url}{path}", data=body.encode('utf-8'), method="POST")
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read()), response.headers["X-Cache"]
+
+    def test_conversion_is_cached_by_content(self):
+        result, cache = self._post("/apparatus?name=bio", BIO_XML)
+        self.assertEqual("miss", cache)
+        self.assertEqual("Vincent Gogh", result["files"]["bio-entities.json"][0]["displayLabel"])
+        self.assertEqual((result, "hit"), self._post("/apparatus?name=bio", BIO_XML))
+        self.assertEqual("miss", self._post("/apparatus?name=bio2", BIO_XML)[1])
+        # cache_size is 1, so the first conversion was evicted
+        self.assertEqual("miss", self._post("/apparatus?name=bio", BIO_XML)[1])
+        self.assertEqual({"cached": 1, "cacheSize": 1, "hits": 1, "misses": 3}, self.service.status())
+
+    def test_malformed_xml_is_reported(self):
+        request = urllib.request.Request(f"{self.url}/home", data=b"<TEI>", method="POST")
+        with self.assertRaises(urllib.error.HTTPError) as context:
+            urllib.request.urlopen(request)
+        self.assertEqual(422, context.exception.code)
+
+
+if __name__ == '__main__':
+    unittest.main()
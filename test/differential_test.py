@@ -0,0 +1,51 @@
+import tempfile
+import unittest
+
+from editem_apparatus.differential import ModeRun, compare_modes, compare_runs, first_difference
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.synthetic_corpus import synthetic_apparatus
+
+
+class DifferentialTestCase(unittest.TestCase):
+    def test_first_difference(self):
+        self.assertIsNone(first_difference({"a": [1, {"b": "x"}], "c": 2}, {"c": 2, "a": [1, {"b": "x"}]}))
+        self.assertEqual('$.a[1].b: expected "x", got "y"',
+                         first_difference({"a": [1, {"b": "x"}]}, {"a": [1, {"b": "y"}]}))
+        self.assertEqual('$.a: expected ["x"], got "x"', first_difference({"a": ["x"]}, {"a": "x"}))
+        self.assertEqual("$.a: expected 1 items, got 2", first_difference({"a": [1]}, {"a": [1, 2]}))
+        self.assertEqual("$.b: not in the reference output", first_difference({"a": 1}, {"a": 1, "b": 2}))
+
+    def test_compare_runs(self):
+        reference = ModeRun("reference", 1.0, [], {
+            "bio.html": b"<p>\nVincent\n</p>",
+            "bio-entities.json": b'[{"id": "pers001", "sex": "1"}]',
+            "bio-search-index.json": b'{"a": 1, "b": 2}',
+            "bio.json": b'{}'
+        })
+        run = ModeRun("fast", 0.5, [], {
+            "bio.html": b"<p>\nTheo\n</p>",
+            "bio-entities.json": b'[{"id": "pers001", "sex": 1}]',
+            "bio-search-index.json": b'{"b": 2, "a": 1}',
+            "artwork.json": b'{}'
+        })
+        self.assertEqual({
+            "artwork.json": "not in the reference output",
+            "bio-entities.json": '$[0].sex: expected "1", got 1',
+            "bio-search-index.json": "same data, different serialization (key order or formatting)",
+            "bio.html": "line 2: expected 'Vincent', got 'Theo'",
+            "bio.json": "missing"
+        }, compare_runs(reference, run))
+
+    def test_modes_match_the_reference(self):
+        with tempfile.TemporaryDirectory() as data_dir:
+            for file_name, xml in synthetic_apparatus(persons=30, artworks=20, bibls=20).items():
+                with open(f"{data_dir}/{file_name}", 'w', encoding='utf-8') as f:
+                    f.write(xml)
+            config = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=data_dir,
+                                           search_index=True, page_size=10, change_feed=True)
+            for comparison in compare_modes(config):
+                self.assertEqual({}, comparison.differences, comparison.mode)
+
+
+if __name__ == '__main__':
+    unittest.main()
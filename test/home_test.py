@@ -0,0 +1,67 @@
+import json
+import tempfile
+import unittest
+
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.home_converter import HomeConverter
+
+HOME_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0" xmlns:ed="https://example.org/editem">
+  <text><body><div type="intro">
+    <p><ed:search facetID="persons" target="bio.xml#pers001">Vincent</ed:search>,
+    <ed:search facetID="persons" target="pers002">Theo</ed:search>,
+    <ed:search facetID="persons" target="bio.xml#pers999">Nobody</ed:search>,
+    <ed:search facetID="artworks" target="artwork.xml#art001">Sower</ed:search></p>
+  </div></body></text>
+</TEI>"""
+
+
+def write_json(path: str, data):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f)
+
+
+class HomeConverterTestCase(unittest.TestCase):
+    def test_search_links_get_result_counts(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            write_json(f"{export_dir}/bio-entities.json", [{"id": "pers001"}, {"id": "pers002"}])
+            write_json(f"{export_dir}/artwork-entities.json", [
+                {"id": "art001", "relation": [{"name": "creator", "ref": "bio.xml#pers001"},
+                                              {"name": "depicts", "ref": "bio.xml#pers001"}]},
+                {"id": "art002", "relation": [{"name": "depicts", "ref": "bio.xml#pers001"},
+                                              {"name": "studyFor", "ref": "#art001"}]}
+            ])
+            # the split entities of artwork.xml must not be counted twice
+            write_json(f"{export_dir}/artwork.paintings-entities.json", [
+                {"id": "art002", "relation": [{"name": "depicts", "ref": "bio.xml#pers001"}]}
+            ])
+            cf = EditemConfig(data_path=".", export_path=".", apparatus_export_path=export_dir)
+            files, errors = HomeConverter(cf).convert_source(HOME_XML, "home")
+        html = files["home.html"]
+        self.assertIn('<a href="?query[terms][personsId][]=pers001" data-count="2">Vincent</a>', html)
+        self.assertIn('<a href="?query[terms][personsId][]=pers002" data-count="0">Theo</a>', html)
+        self.assertIn('<a href="?query[terms][personsId][]=pers999">Nobody</a>', html)
+        # a relation to an entity in the same file
+        self.assertIn('<a href="?query[terms][artworksId][]=art001" data-count="1">Sower</a>', html)
+        self.assertEqual(1, len(errors))
+        self.assertTrue(errors[0].endswith(": bio.xml#pers999"))
+
+    def test_result_counts_follow_a_new_apparatus_export(self):
+        with tempfile.TemporaryDirectory() as data_dir, tempfile.TemporaryDirectory() as export_dir, \
+                tempfile.TemporaryDirectory() as apparatus_export_dir:
+            with open(f"{data_dir}/home.xml", 'w', encoding='utf-8') as f:
+                f.write(HOME_XML)
+            write_json(f"{apparatus_export_dir}/bio-entities.json", [{"id": "pers001"}, {"id": "pers002"}])
+            cf = EditemConfig(data_path=data_dir, export_path=export_dir, validate=False,
+                              apparatus_export_path=apparatus_export_dir)
+            converter = HomeConverter(cf)
+            counts = []
+            for relations in ([], [{"name": "depicts", "ref": "bio.xml#pers002"}]):
+                write_json(f"{apparatus_export_dir}/artwork-entities.json", [{"id": "art001", "relation": relations}])
+                converter.convert()
+                with open(f"{export_dir}/home.html", encoding='utf-8') as f:
+                    counts.append('pers002" data-count="1"' in f.read())
+        self.assertEqual([False, True], counts)
+
+
+if __name__ == '__main__':
+    unittest.main()
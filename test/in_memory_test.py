@@ -0,0 +1,75 @@
+import os
+import tempfile
+import unittest
+
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.in_memory import convert_apparatus_xml, convert_home_xml, convert_menu_xml
+
+BIO_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader><fileDesc><titleStmt><title>Persons</title></titleStmt></fileDesc></teiHeader>
+  <text>
+    <body>
+      <listPerson>
+        <person xml:id="pers001"><persName><forename>Vincent</forename> <surname>Gogh</surname></persName></person>
+      </listPerson>
+    </body>
+  </text>
+</TEI>"""
+
+MENU_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <standOff>
+    <menubar>
+      <menu><label>About</label><menuitem><label>Persons</label><ptr target="bio.xml"/></menuitem></menu>
+    </menubar>
+  </standOff>
+</TEI>"""
+
+HOME_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <text><body><div type="intro"><head level="h1">Welcome</head></div></body></text>
+</TEI>"""
+
+
+class InMemoryTestCase(unittest.TestCase):
+    def test_convert_apparatus_xml(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            export_path = f"{tmp_dir}/export"
+            log_file_path = f"{tmp_dir}/convert.log"
+            cf = EditemApparatusConfig(project_name="test", data_path=tmp_dir, export_path=export_path,
+                                       log_file_path=log_file_path)
+            result = convert_apparatus_xml(BIO_XML.encode('utf-8'), cf, "bio")
+            self.assertEqual([], result.errors)
+            self.assertEqual("Vincent Gogh", result.entities["bio"][0]["displayLabel"])
+            self.assertEqual("Gogh, Vincent", result.entity_dict["bio/pers001"]["sortLabel"])
+            self.assertEqual("pers001", result.document["text"]["body"]["listPerson"]["person"]["id"])
+            self.assertTrue(result.html.startswith("<h2>Persons</h2>"))
+            self.assertFalse(os.path.exists(export_path))
+            self.assertFalse(os.path.exists(log_file_path))
+
+    def test_tables_are_kept_in_memory(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            export_path = f"{tmp_dir}/export"
+            for table_format in ("tsv", "csv"):
+                cf = EditemApparatusConfig(project_name="test", data_path=tmp_dir, export_path=export_path,
+                                           table_format=table_format, relation_graph=True, gzip_level=6)
+                result = convert_apparatus_xml(BIO_XML, cf, "bio")
+                self.assertEqual([], result.errors)
+                self.assertTrue(result.files[f"persons.{table_format}"].startswith("id"))
+                self.assertIn("pers001", result.files[f"persons.{table_format}"])
+                self.assertIn("relation-graph.json", result.files)
+            self.assertEqual([], os.listdir(tmp_dir))
+
+    def test_convert_menu_xml(self):
+        cf = EditemConfig(data_path="in", export_path="out")
+        result = convert_menu_xml(MENU_XML, cf)
+        self.assertEqual({"menu": {"label": "About", "items": [{"label": "Persons", "target": "bio"}]}},
+                         result.menu)
+
+    def test_convert_home_xml(self):
+        cf = EditemConfig(data_path="in", export_path="out")
+        result = convert_home_xml(HOME_XML, cf)
+        self.assertEqual('<div class="intro"><h1>Welcome</h1></div>', result.html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import gzip
+import os
+import tarfile
+import tempfile
+import unittest
+import zipfile
+
+from editem_apparatus.io_tools import ArchiveIOHandler, IOHandler
+
+
+class IOHandlerTestCase(unittest.TestCase):
+    def test_gzip_sidecar_is_written_next_to_output(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rw = IOHandler(gzip_level=6)
+            path = f"{tmp_dir}/entities.json"
+            rw.write_json(path, [{"id": "pers001", "displayLabel": "Vincent van Gogh"}])
+            with open(path, 'rb') as f:
+                content = f.read()
+            with gzip.open(f"{path}.gz", 'rb') as f:
+                self.assertEqual(content, f.read())
+
+    def test_gzip_sidecar_is_only_regenerated_when_content_changes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            rw = IOHandler(gzip_level=9)
+            path = f"{tmp_dir}/page.html"
+            gzip_path = f"{path}.gz"
+            rw.write_text(path, "<p>one</p>")
+            os.utime(gzip_path, (0, 0))
+            rw.write_text(path, "<p>one</p>")
+            self.assertEqual(0, os.path.getmtime(gzip_path))
+            rw.write_text(path, "<p>two</p>")
+            self.assertNotEqual(0, os.path.getmtime(gzip_path))
+            with gzip.open(gzip_path, 'rt') as f:
+                self.assertEqual("<p>two</p>", f.read())
+
+    def test_no_gzip_sidecar_by_default(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = f"{tmp_dir}/page.html"
+            IOHandler().write_text(path, "<p>one</p>")
+            self.assertFalse(os.path.exists(f"{path}.gz"))
+
+    def test_tsv_is_in_postgresql_text_format(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = f"{tmp_dir}/bibls.tsv"
+            IOHandler(gzip_level=6).write_tsv(path, ["id", "text", "level"],
+                                              [["bib001", 'a "quoted"\ttab,\nnewline and C:\\path', None]])
+            with open(path, 'rb') as f:
+                content = f.read()
+            self.assertEqual(b'id\ttext\tlevel\nbib001\ta "quoted"\\ttab,\\nnewline and C:\\\\path\t\\N\n', content)
+            with gzip.open(f"{path}.gz", 'rb') as f:
+                self.assertEqual(content, f.read())
+
+    def test_archive_is_completed_when_writing_fails(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            archive_path = f"{tmp_dir}/export.zip"
+            with self.assertRaises(RuntimeError):
+                with ArchiveIOHandler(archive_path, "/out") as rw:
+                    rw.write_text("/out/page.html", "<p>one</p>")
+                    raise RuntimeError("conversion failed")
+            with zipfile.ZipFile(archive_path) as archive:
+                self.assertEqual(["page.html"], archive.namelist())
+
+    def test_archive_entries_have_paths_relative_to_root(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for archive_name in ("export.zip", "export.tar.xz"):
+                archive_path = f"{tmp_dir}/{archive_name}"
+                rw = ArchiveIOHandler(archive_path, "/out/", file_url_prefix="https://example.org/", gzip_level=6)
+                rw.write_text("/out/page.html", "<p>één</p>")
+                rw.write_tsv("/out/persons.tsv", ["id", "label"], [["pers001", "Vincent"]])
+                rw.close()
+                self.assertEqual(["https://example.org/page.html", "https://example.org/persons.tsv"],
+                                 rw.generated_file_urls)
+                if archive_name.endswith(".zip"):
+                    with zipfile.ZipFile(archive_path) as archive:
+                        names = archive.namelist()
+                        page = archive.read("page.html")
+                        tsv = archive.read("persons.tsv")
+                else:
+                    with tarfile.open(archive_path) as archive:
+                        names = archive.getnames()
+                        page = archive.extractfile("page.html").read()
+                        tsv = archive.extractfile("persons.tsv").read()
+                self.assertEqual(["page.html", "page.html.gz", "persons.tsv", "persons.tsv.gz"], names)
+                self.assertEqual("<p>één</p>", page.decode('utf-8'))
+                self.assertEqual(b"id\tlabel\npers001\tVincent\n", tsv)
+
+    def test_unsupported_archive_type(self):
+        with self.assertRaises(ValueError):
+            ArchiveIOHandler("export.rar", "/out")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import unittest
+
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.menu_converter import MenuConverter
+
+MENU_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <teiHeader/>
+  <standOff>
+    <menubar>
+      <menu xml:lang="nl">
+        <label>Over</label>
+        <menuitem><label>Inleiding</label><ptr target="intro.xml"/></menuitem>
+        <menuitem><label>Personen</label><ptr target="bio.xml"/>
+          <menuitem><label>Kapot</label><ptr target="missing.xml#x"/></menuitem>
+        </menuitem>
+      </menu>
+      <menu xml:lang="en">
+        <label>About</label>
+        <menuitem><label>Gone</label><ptr target="gone.xml"/></menuitem>
+      </menu>
+    </menubar>
+  </standOff>
+</TEI>"""
+
+
+class MenuConverterTestCase(unittest.TestCase):
+    def test_menu_structure(self):
+        cf = EditemConfig(data_path=".", export_path=".", show_progress=True)
+        files, errors = MenuConverter(cf).convert_source(MENU_XML, "menu")
+        self.assertEqual([], errors)
+        expected = {
+            "menu": [
+                {
+                    "lang": "nl",
+                    "label": "Over",
+                    "items": [
+                        {"label": "Inleiding", "target": "intro"},
+                        {"label": "Personen", "target": "bio", "items": [{"label": "Kapot", "target": "missing#x"}]}
+                    ]
+                },
+                {
+                    "lang": "en",
+                    "label": "About",
+                    "items": [{"label": "Gone", "target": "gone"}]
+                }
+            ]
+        }
+        self.assertEqual(expected, files["menu.json"])
+
+    def test_several_menubars_give_a_list(self):
+        menu_xml = """<TEI xmlns="http://www.tei-c.org/ns/1.0"><standOff>
+          <menubar xml:id="main"><menu><label>Over</label></menu></menubar>
+          <menubar xml:id="footer"><menu><label>Colofon</label><ptr target="colophon.xml"/></menu></menubar>
+        </standOff></TEI>"""
+        cf = EditemConfig(data_path=".", export_path=".")
+        files, errors = MenuConverter(cf).convert_source(menu_xml, "menu")
+        self.assertEqual([], errors)
+        self.assertEqual([{"id": "main", "menu": {"label": "Over"}},
+                          {"id": "footer", "menu": {"label": "Colofon", "target": "colophon"}}], files["menu.json"])
+
+    def test_broken_targets_are_reported_together(self):
+        with tempfile.TemporaryDirectory() as apparatus_dir:
+            for name in ("intro.xml", "bio.xml"):
+                open(os.path.join(apparatus_dir, name), 'w').close()
+            cf = EditemConfig(data_path=".", export_path=".", show_progress=True, apparatus_path=apparatus_dir)
+            _, errors = MenuConverter(cf).convert_source(MENU_XML, "menu")
+            self.assertEqual(1, len(errors))
+            self.assertTrue(errors[0].endswith(": gone.xml, missing.xml#x"))
+
+    def test_prefetch_manifest(self):
+        with tempfile.TemporaryDirectory() as export_dir:
+            for name, content in (("bio.json", "{}"), ("bio.html", "<p/>"), ("bio-entities.json", "[]"),
+                                  ("bio-entities.json.gz", ""), ("bio-extra.json", "{}"), ("bio-extra.html", ""),
+                                  ("intro.json", "{}"), ("intro.html", "<h1>Intro</h1>")):
+                with open(os.path.join(export_dir, name), 'w') as f:
+                    f.write(content)
+            cf = EditemConfig(data_path=".", export_path=".", apparatus_export_path=export_dir)
+            files, errors = MenuConverter(cf).convert_source(MENU_XML, "menu")
+        manifest = files["menu-prefetch.json"]
+        self.assertEqual(["intro", "bio", "missing#x", "gone"], list(manifest))
+        self.assertEqual(["bio-entities.json", "bio.html", "bio.json"], [f["file"] for f in manifest["bio"]])
+        etag = f'"{hashlib.sha256(b"<h1>Intro</h1>").hexdigest()}"'
+        self.assertEqual([{"file": "intro.html", "bytes": 14, "etag": etag}], manifest["intro"][:1])
+        self.assertEqual([], manifest["gone"])
+        self.assertEqual(1, len(errors))
+        self.assertTrue(errors[0].endswith(": gone.xml, missing.xml#x"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import tempfile
+import threading
+import time
+import unittest
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.pipeline import Pipeline, Stage, parse_stage_workers
+from editem_apparatus.synthetic_corpus import synthetic_apparatus
+
+
+class PipelineTestCase(unittest.TestCase):
+    def test_items_flow_through_all_stages(self):
+        results = []
+        stages = [Stage("double", lambda i: i * 2, workers=3),
+                  Stage("drop odd", lambda i: i if i % 4 == 0 else None),
+                  Stage("collect", results.append)]
+        stats = Pipeline(stages, queue_size=2).run(range(10))
+        self.assertEqual([0, 4, 8, 12, 16], sorted(results))
+        self.assertEqual([10, 10, 5], [s.processed for s in stats])
+        self.assertTrue(all(s.max_queue_depth <= 2 for s in stats))
+
+    def test_slow_stage_holds_back_the_feeder(self):
+        fed = []
+        release = threading.Event()
+
+        def items():
+            for i in range(20):
+                fed.append(i)
+                yield i
+
+        def slow(i):
+            release.wait()
+            return i
+
+        thread = threading.Thread(target=Pipeline([Stage("slow", slow)], queue_size=2).run, args=(items(),))
+        thread.start()
+        time.sleep(0.2)
+        # one item in progress, two waiting in the queue, one blocked on the full queue
+        self.assertLessEqual(len(fed), 4)
+        release.set()
+        thread.join()
+        self.assertEqual(20, len(fed))
+
+    def test_errors_stop_the_pipeline(self):
+        processed = []
+
+        def fail_on_3(i):
+            if i == 3:
+                raise RuntimeError("item 3")
+            return i
+
+        pipeline = Pipeline([Stage("check", fail_on_3), Stage("collect", processed.append)], queue_size=1)
+        with self.assertRaisesRegex(RuntimeError, "item 3"):
+            pipeline.run(range(1000))
+        self.assertLess(len(processed), 10)
+
+    def test_parse_stage_workers(self):
+        self.assertEqual({"parse": 2, "write": 1}, parse_stage_workers(["parse=2", "write=1"]))
+        with self.assertRaises(ValueError):
+            parse_stage_workers(["parse"])
+
+    def test_pipeline_conversion_gives_the_same_output(self):
+        corpus = synthetic_apparatus(persons=30, artworks=20, bibls=20)
+        with tempfile.TemporaryDirectory() as data_dir:
+            for name, xml in corpus.items():
+                with open(f"{data_dir}/{name}", 'w', encoding='utf-8') as f:
+                    f.write(xml)
+            outputs = []
+            for pipeline in (False, True):
+                export_dir = f"{data_dir}/export-{pipeline}"
+                cf = EditemApparatusConfig(project_name="test", data_path=data_dir, export_path=export_dir,
+                                           search_index=True, change_feed=True, pipeline=pipeline,
+                                           pipeline_workers={"parse": 2, "render": 2})
+                converter = ApparatusConverter(cf)
+                errors = converter.convert()
+                files = {}
+                for url in converter.rw.generated_file_urls:
+                    with open(url, 'rb') as f:
+                        files[url.removeprefix(export_dir)] = f.read()
+                outputs.append((errors, files))
+            self.assertEqual(outputs[0], outputs[1])
+            self.assertEqual(["read", "parse", "transform", "render", "write"],
+                             [s["stage"] for s in converter.pipeline_stats])
+
+    def test_unknown_stage(self):
+        with self.assertRaises(ValueError):
+            ApparatusConverter(EditemApparatusConfig(project_name="test", data_path=".", export_path=".",
+                                                     pipeline=True, pipeline_workers={"convert": 2}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,36 @@
+import unittest
+
+from editem_apparatus.search_index import build_search_index, find_duplicate_labels, tokenize
+
+
+class SearchIndexTestCase(unittest.TestCase):
+    def test_tokenize_normalizes_case_and_diacritics(self):
+        self.assertEqual(["isaac", "israels", "ellen"], tokenize("Isaac Israëls, Éllen"))
+
+    def test_build_search_index(self):
+        entities = [
+            {"id": "pers001", "displayLabel": "Vincent van Gogh", "sortLabel": "Van Gogh, Vincent",
+             "note": {"nl": "Schilder", "en": "Painter"}},
+            {"id": "pers002", "displayLabel": "Theo van Gogh", "sortLabel": "Van Gogh, Theo",
+             "sex": "1"},
+        ]
+        index = build_search_index(entities, {"nl", "en"})
+        self.assertEqual(["pers001", "pers002"], index["ids"])
+        self.assertEqual(sorted(index["terms"]), index["terms"])
+        postings = dict(zip(index["terms"], index["postings"]))
+        self.assertEqual([0, 1], postings["gogh"])
+        self.assertEqual([0], postings["painter"])
+        self.assertEqual([1], postings["theo"])
+        self.assertNotIn("1", postings)
+
+    def test_find_duplicate_labels(self):
+        entities = [
+            {"id": "pers001", "displayLabel": "Jan de Vries"},
+            {"id": "pers002", "displayLabel": "Piet"},
+            {"id": "pers003", "displayLabel": "Jan de Vries"},
+        ]
+        self.assertEqual({"Jan de Vries": ["pers001", "pers003"]}, find_duplicate_labels(entities))
+
+
+if __name__ == '__main__':
+    unittest.main()
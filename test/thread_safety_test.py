@@ -0,0 +1,69 @@
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.configs import EditemConfig
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.menu_converter import MenuConverter
+from editem_apparatus.synthetic_corpus import synthetic_apparatus
+
+MENU_XML = """<TEI xmlns="http://www.tei-c.org/ns/1.0">
+  <standOff><menubar><menu><label>Project {i}</label></menu></menubar></standOff>
+</TEI>"""
+
+
+def convert_project(root: str, i: int) -> dict:
+    data_dir = f"{root}/data-{i}"
+    export_dir = f"{root}/export-{i}"
+    os.makedirs(data_dir)
+    for file_name, xml in synthetic_apparatus(persons=20 + i, artworks=10, bibls=10, seed=i).items():
+        with open(f"{data_dir}/{file_name}", 'w', encoding='utf-8') as f:
+            f.write(xml)
+    config_dir = f"{root}/config-{i}"
+    os.makedirs(config_dir)
+    with open(f"{config_dir}/menu.xml", 'w', encoding='utf-8') as f:
+        f.write(MENU_XML.format(i=i))
+    log_file = f"{root}/convert-{i}.log"
+    apparatus_converter = ApparatusConverter(EditemApparatusConfig(
+        project_name=f"project-{i}", data_path=data_dir, export_path=export_dir, log_file_path=log_file,
+        pipeline=i % 2 == 0))
+    menu_converter = MenuConverter(EditemConfig(data_path=config_dir, export_path=export_dir))
+    errors = apparatus_converter.convert() + menu_converter.convert()
+    with open(f"{export_dir}/bio-entities.json", encoding='utf-8') as f:
+        persons = len(json.load(f))
+    with open(f"{export_dir}/menu.json", encoding='utf-8') as f:
+        menu = json.load(f)
+    with open(log_file, encoding='utf-8') as f:
+        log_lines = f.read().splitlines()
+    return {
+        "errors": errors,
+        "persons": persons,
+        "menu": menu,
+        "generated_files": apparatus_converter.rw.generated_file_urls + menu_converter.rw.generated_file_urls,
+        "log_lines": log_lines,
+        "export_dir": export_dir
+    }
+
+
+class ThreadSafetyTestCase(unittest.TestCase):
+    def test_parallel_conversions_in_threads(self):
+        projects = 12
+        with tempfile.TemporaryDirectory() as root:
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                results = list(executor.map(lambda i: convert_project(root, i), range(projects)))
+            for i, result in enumerate(results):
+                self.assertEqual([], result["errors"])
+                self.assertEqual(20 + i, result["persons"])
+                self.assertEqual({"menu": {"label": f"Project {i}"}}, result["menu"])
+                self.assertTrue(all(f.startswith(f"{result['export_dir']}/") for f in result["generated_files"]))
+                self.assertTrue(result["log_lines"])
+                # the log file of a conversion has the files of that conversion only
+                for line in result["log_lines"]:
+                    self.assertNotRegex(line, rf"(data|export|config)-(?!{i}/)\d+/")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import tempfile
+import unittest
+
+from editem_apparatus.validation import APPARATUS_CAPTURE_ELEMENTS, APPARATUS_REQUIRED_ATTRIBUTES, \
+    HOME_CAPTURE_ELEMENTS, HOME_REQUIRED_ATTRIBUTES, validate_files
+
+
+def write_files(tmp_dir: str, files: dict[str, str]) -> list[str]:
+    paths = []
+    for name, xml in files.items():
+        path = f"{tmp_dir}/{name}"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(xml)
+        paths.append(path)
+    return paths
+
+
+class ValidationTestCase(unittest.TestCase):
+    def test_all_problems_are_reported(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = write_files(tmp_dir, {
+                "bio.xml": '<TEI>\n<body>\n<person xml:id="p1"/>\n<person xml:id="p1"/>\n<hi>x</hi>\n</body>\n</TEI>',
+                "artwork.xml": '<TEI>\n<teiHeader><hi>ok outside body</hi></teiHeader>\n<object xml:id="p1"/>\n</TEI>',
+                "broken.xml": '<TEI>\n<body>\n</TEI>',
+            })
+            problems = validate_files(paths, APPARATUS_REQUIRED_ATTRIBUTES, APPARATUS_CAPTURE_ELEMENTS)
+            self.assertEqual([
+                'bio.xml:4: duplicate xml:id "p1", first used in bio.xml:3',
+                'bio.xml:5: <hi> has no rend attribute',
+                'broken.xml:3: not well-formed: mismatched tag',
+            ], problems)
+
+    def test_home_required_attributes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            paths = write_files(tmp_dir, {
+                "home.xml": '<TEI><body><head>Welcome</head><listBibl/><head level="h1">ok</head></body></TEI>'
+            })
+            problems = validate_files(paths, HOME_REQUIRED_ATTRIBUTES, HOME_CAPTURE_ELEMENTS)
+            self.assertEqual(['home.xml:1: <head> has no level attribute',
+                              'home.xml:1: <listBibl> has no xml:id attribute'], problems)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import tempfile
+import unittest
+
+from editem_apparatus.apparatus_converter import ApparatusConverter
+from editem_apparatus.editem_apparatus_config import EditemApparatusConfig
+from editem_apparatus.synthetic_corpus import synthetic_apparatus
+from editem_apparatus.xml_backend import StdlibXmlBackend, get_xml_backend, lxml_is_available
+
+
+class XmlBackendTestCase(unittest.TestCase):
+    def test_get_xml_backend(self):
+        self.assertIsInstance(get_xml_backend("stdlib"), StdlibXmlBackend)
+        with self.assertRaises(ValueError):
+            get_xml_backend("libxml")
+
+    @unittest.skipUnless(lxml_is_available(), "lxml is not installed")
+    def test_backends_give_the_same_output(self):
+        corpus = synthetic_apparatus(persons=40, artworks=20, bibls=20)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputs = {}
+            for backend in ("stdlib", "lxml"):
+                cf = EditemApparatusConfig(project_name="test", data_path=tmp_dir, export_path=tmp_dir,
+                                           log_file_path=None, xml_backend=backend)
+                ac = ApparatusConverter(cf)
+                self.assertEqual(backend, ac.xml_backend.name)
+                outputs[backend] = {name: ac.convert_source(xml, name.replace(".xml", ""))
+                                    for name, xml in corpus.items()}
+            self.assertEqual(outputs["stdlib"], outputs["lxml"])
+
+
+if __name__ == '__main__':
+    unittest.main()